@@ -3,22 +3,57 @@
 import argparse
 import datetime
 import json
+import sys
 import time
 
 from tabulate import tabulate
 
 
-if __name__ == "__main__":
+if __name__ == "__main__" and sys.argv[1:2] == ["bench"]:
+    from . import bench
+    bench.main(sys.argv[2:])
+elif __name__ == "__main__" and sys.argv[1:2] == ["worker"]:
+    from . import oop_sharded
+    oop_sharded.worker_main(sys.argv[2:])
+elif __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument("mode", choices=["oop", "oop-parallel", "procedural"],
+    parser.add_argument("mode",
+        choices=["oop", "oop-parallel", "oop-threaded", "oop-sharded",
+            "procedural"],
         help="mode of simulation")
-    parser.add_argument("simulator", choices=["exit-time", "occupation-time"],
+    parser.add_argument("simulator",
+        choices=["exit-time", "occupation-time", "exit-time-sweep"],
         help="simulator")
     parser.add_argument("config", help="configuration file")
+    parser.add_argument("--memory", type=float,
+        help="memory budget in MiB (default: half the available memory)")
+    parser.add_argument("--float32", action="store_true",
+        help="generate increments in single precision")
+    parser.add_argument("--profile", action="store_true",
+        help="time the phases of the run")
+    parser.add_argument("--checkpoint",
+        help="file to save partial results to and resume them from")
+    parser.add_argument("--queue", default="eosim-queue",
+        help="oop-sharded: directory the workers take shards from")
+    parser.add_argument("--local-workers", type=int,
+        help="oop-sharded: workers to start on this machine "
+        "(default: one per core)")
     args = parser.parse_args()
+    if args.mode == "procedural" and args.simulator == "exit-time-sweep":
+        parser.error("the procedural mode has no exit-time-sweep")
 
     with open(args.config) as file:
         data = json.load(file)
+    if args.memory is not None:
+        data["memory"] = args.memory
+    if args.float32:
+        data["float32"] = True
+    if args.profile:
+        data["profile"] = True
+    if args.checkpoint is not None:
+        data["checkpoint"] = args.checkpoint
+    if args.mode == "procedural" and data.get("profile"):
+        parser.error("the procedural mode has no profile")
 
     # compute result
     t0 = time.perf_counter()
@@ -26,21 +61,43 @@ if __name__ == "__main__":
         from . import oop as mode
     elif args.mode == "oop-parallel":
         from . import oop_parallel as mode
+    elif args.mode == "oop-threaded":
+        from . import oop_threaded as mode
+    elif args.mode == "oop-sharded":
+        from . import oop_sharded as mode
+        mode.queue = args.queue
+        if args.local_workers is not None:
+            mode.local_workers = args.local_workers
     else: # args.mode == "procedural"
         from . import procedural as mode
-    result = mode.main(args.simulator, **data)
+    result, report = mode.main(args.simulator, **data)
     t1 = time.perf_counter()
 
     # print message
+    samples = f'{data["n"]} per gridpoint'
+    if data.get("tol") is not None:
+        samples = f'at most {samples}, tol={data["tol"]}'
     msg = [
         ["Grid", f'max_t={data["max_t"]}, dt={data["dt"]}, dx={data["dx"]}'],
-        ["No. Samples", f'{data["n"]} per gridpoint'],
-        ["Estimate", result],
+        ["No. Samples", samples],
+        *([["Estimate", result]] if args.simulator != "exit-time-sweep"
+            else []),
+        *report,
         ["Performance", datetime.timedelta(seconds=t1-t0)]
     ]
+    if data.get("profile"):
+        from . import timing
+        summed = {"oop": "phases of the run",
+            "oop-threaded": "phases summed over threads"}
+        if timing.counters:
+            msg += [["Profile", summed.get(args.mode,
+                "worker phases summed over workers")], *timing.rows()]
     if args.simulator == "exit-time":
         msg.insert(0, [f"ExitTimeSimulator ({args.mode})"])
         msg.insert(1, ["Domain", data["domain"]])
+    elif args.simulator == "exit-time-sweep":
+        msg.insert(0, [f"ExitTimeSweepSimulator ({args.mode})"])
+        msg.insert(1, ["Domains", ",\n".join(map(str, data["domains"]))])
     else: # args.simulator == "occupation-time"
         msg.insert(0, [f"OccupationTimeSimulator ({args.mode})"])
         msg.insert(1, ["Domain D, V",
@@ -0,0 +1,180 @@
+import argparse
+import datetime
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+import psutil
+
+from .oop import domain_parser
+
+
+modes = ["oop", "oop-parallel", "oop-threaded", "procedural"]
+# modes run by several workers
+pooled = ["oop-parallel", "oop-threaded"]
+simulators = ["exit-time", "occupation-time"]
+# the procedural mode cuts paths off at max_t, by when a path in the unit
+# ball is still inside with probability below 1e-12; the oop modes run
+# every path until it exits
+max_t = 10.
+
+
+# peak resident memory of process and its children in bytes, from VmHWM
+# where /proc provides it and the current RSS otherwise
+def peak_rss(process):
+    total = 0
+    for proc in [process, *process.children(recursive=True)]:
+        try:
+            with open(f"/proc/{proc.pid}/status") as file:
+                hwm = [line for line in file if line.startswith("VmHWM:")]
+            total += int(hwm[0].split()[1]) * 1024
+        except (OSError, IndexError):
+            total += proc.memory_info().rss
+    return total
+
+
+# the unit ball about the origin and, for the occupation time, the ball of
+# radius 0.75 inside it
+def config(case, options):
+    c = [0] * case["dim"]
+    data = dict(max_t=case["max_t"] if case["mode"] == "procedural" else None,
+        dt=case["dt"], dx=case["dx"], n=case["n"], **options)
+    if case["simulator"] == "exit-time":
+        data["domain"] = ["OpenBall", c, 1]
+    else:
+        data["domain_d"] = ["OpenBall", c, 1]
+        data["domain_v"] = ["OpenBall", c, 0.75]
+    return data
+
+
+# the paths a simulator reports it drew, which symmetry, search, tol and
+# MLMC take away from n per gridpoint; the procedural mode reports nothing
+# and draws exactly that
+def paths_used(report, default):
+    for key, value in report:
+        if key == "Samples Used":
+            return int(value.split()[0])
+    return default
+
+
+# runs in a fresh interpreter so its peak memory is the case's own; an
+# antithetic pair of paths is one sample. A pool's startup is timed apart
+# from the run, so the efficiency of a pooled mode measures its scaling
+def run_case(case, options):
+    if case["mode"] == "oop":
+        from . import oop as mode
+    elif case["mode"] == "oop-parallel":
+        from . import oop_parallel as mode
+        mode.n_cores = case["workers"]
+    elif case["mode"] == "oop-threaded":
+        from . import oop_threaded as mode
+        mode.n_threads = case["workers"]
+    else:
+        from . import procedural as mode
+    data = config(case, options)
+    t0 = time.perf_counter()
+    if case["mode"] in pooled:
+        mode.warm_up()
+    startup = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    result, report = mode.main(case["simulator"], **data)
+    seconds = time.perf_counter() - t0
+    domain = data.get("domain", data.get("domain_v"))
+    grid = domain_parser(domain).generate_grid(data["dx"])
+    paths = paths_used(report, len(grid) * case["n"])
+    samples = paths // (2 if options.get("antithetic") else 1)
+    return dict(case, seconds=seconds, startup_seconds=startup,
+        result=float(result), gridpoints=len(grid),
+        samples_per_sec=samples/seconds, paths_per_sec=paths/seconds,
+        peak_rss_mib=peak_rss(psutil.Process())/2**20)
+
+
+# each case runs in a fresh interpreter, where joblib can start its own
+# workers, and reports back on its last line of output; a case that fails
+# reports the last line of its error instead
+def run_isolated(case, options):
+    code = ("import json, sys; from eosim import bench; "
+        "print(json.dumps(bench.run_case(*json.loads(sys.argv[1]))))")
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None,
+        [os.path.dirname(os.path.dirname(__file__)),
+        os.environ.get("PYTHONPATH")])))
+    try:
+        out = subprocess.run([sys.executable, "-c", code,
+            json.dumps([case, options])], env=env, capture_output=True,
+            text=True, check=True).stdout
+    except subprocess.CalledProcessError as error:
+        lines = error.stderr.strip().splitlines() or [str(error)]
+        return dict(case, error=lines[-1])
+    return json.loads(out.splitlines()[-1])
+
+
+# speedup of each case of a pooled mode over its single worker run, divided
+# by the number of workers; failed cases have none
+def efficiencies(results):
+    key = lambda r: tuple(r[k]
+        for k in ("mode", "simulator", "n", "dt", "dx", "dim"))
+    serial = {key(r): r["seconds"] for r in results
+        if r["mode"] in pooled and r["workers"] == 1 and "error" not in r}
+    for r in results:
+        r["efficiency"] = None
+        if r["mode"] in pooled and key(r) in serial and "error" not in r:
+            r["efficiency"] = serial[key(r)] / (r["workers"]*r["seconds"])
+
+
+def version():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(__file__), capture_output=True, text=True,
+            check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    n_cores = psutil.cpu_count(logical=False) or os.cpu_count() or 1
+    parser = argparse.ArgumentParser(prog="python3 -m eosim bench")
+    parser.add_argument("--mode", nargs="+", choices=modes, default=modes)
+    parser.add_argument("--simulator", nargs="+", choices=simulators,
+        default=simulators)
+    parser.add_argument("--n", nargs="+", type=int, default=[1000, 4000])
+    parser.add_argument("--dt", nargs="+", type=float, default=[1e-2])
+    parser.add_argument("--dx", nargs="+", type=float, default=[1., 0.5])
+    parser.add_argument("--dim", nargs="+", type=int, default=[2, 3])
+    parser.add_argument("--workers", nargs="+", type=int,
+        default=sorted({1, n_cores}))
+    parser.add_argument("--max-t", type=float, default=max_t,
+        help="where the procedural mode cuts paths off")
+    parser.add_argument("--option", nargs=2, action="append", default=[],
+        metavar=("KEY", "VALUE"), help="extra configuration key (JSON value)")
+    parser.add_argument("--output", default="bench.json")
+    args = parser.parse_args(argv)
+    options = {key: json.loads(value) for key, value in args.option}
+
+    cases = []
+    for mode, simulator, n, dt, dx, dim, workers in itertools.product(
+            args.mode, args.simulator, args.n, args.dt, args.dx, args.dim,
+            args.workers):
+        if mode not in pooled and workers != 1:
+            continue
+        cases.append(dict(mode=mode, simulator=simulator, n=n, dt=dt, dx=dx,
+            dim=dim, workers=workers, max_t=args.max_t))
+    results = []
+    for j, case in enumerate(cases):
+        results.append(run_isolated(case, options))
+        outcome = results[-1].get("error")
+        if outcome is None:
+            outcome = f"{results[-1]['seconds']:.3g}s"
+        print(f"[{j+1}/{len(cases)}] " + ", ".join(f"{k}={v}"
+            for k, v in case.items() if k != "max_t") + f": {outcome}")
+    efficiencies(results)
+
+    with open(args.output, "w") as file:
+        json.dump(dict(version=version(),
+            date=datetime.datetime.now().isoformat(timespec="seconds"),
+            python=platform.python_version(), numpy=np.__version__,
+            cores=n_cores, options=options, results=results), file, indent=4)
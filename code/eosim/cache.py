@@ -0,0 +1,44 @@
+import hashlib
+import os
+
+import numpy as np
+
+
+# directory of per-point estimator states, one file per grid point named
+# after a hash of the simulation's signature and the point; reading an entry
+# marks it as used, and the least recently used go once size MiB is exceeded
+class Cache():
+    def __init__(self, path, size=64):
+        self.path = path
+        self.size = size
+        os.makedirs(path, exist_ok=True)
+
+    def file(self, signature, pt):
+        digest = hashlib.blake2b(signature.encode(), digest_size=16)
+        digest.update(np.asarray(pt, dtype=float).tobytes())
+        return os.path.join(self.path, f"{digest.hexdigest()}.npy")
+
+    def get(self, signature, pt):
+        file = self.file(signature, pt)
+        try:
+            entry = np.load(file)
+        except (FileNotFoundError, ValueError):
+            return None
+        os.utime(file)
+        return entry
+
+    def put(self, signature, pt, entry):
+        file = self.file(signature, pt)
+        with open(f"{file}.tmp", "wb") as tmp:
+            np.save(tmp, entry)
+        os.replace(f"{file}.tmp", file)
+
+    def evict(self):
+        entries = sorted((e for e in os.scandir(self.path)
+            if e.name.endswith(".npy")), key=lambda e: e.stat().st_mtime)
+        total = sum(e.stat().st_size for e in entries)
+        for e in entries:
+            if total <= self.size * 2**20:
+                break
+            total -= e.stat().st_size
+            os.remove(e.path)
@@ -0,0 +1,48 @@
+import os
+
+import numpy as np
+
+from . import oop
+from .stats import RunningStats
+
+
+# a grid point's count, mean and M2 of the estimator and of the plain
+# samples and its batch counter, one row per state
+def entry(states, i):
+    return np.array([[st.stats[i].count, st.stats[i].mean, st.stats[i].m2,
+        st.raw[i].count, st.raw[i].mean, st.raw[i].m2, st.batches[i]]
+        for st in states], dtype=float)
+
+
+def restore(states, i, entry):
+    for state, row in zip(states, entry):
+        state.stats[i] = RunningStats(np.int_(row[0]), row[1], row[2])
+        state.raw[i] = RunningStats(np.int_(row[3]), row[4], row[5])
+        state.batches[i] = row[6]
+
+
+# the entries of all grid points, written to a temporary file first so an
+# interrupted write keeps the last checkpoint
+def save(path, signature, points, states):
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as file:
+        np.savez(file, signature=signature, points=points,
+            entries=np.array([entry(states, i) for i in range(len(points))]))
+    os.replace(tmp, path)
+
+
+# n_states GridStates for points, resumed from the checkpoint at path for
+# the points it holds; signature guards against resuming another simulation
+def load(path, signature, points, n_states=1):
+    states = [oop.GridState(len(points)) for _ in range(n_states)]
+    if path is None or not os.path.exists(path):
+        return states
+    with np.load(path) as data:
+        if str(data["signature"]) != signature:
+            raise ValueError(f"{path} checkpoints a different simulation")
+        index = {pt.tobytes(): j for j, pt in enumerate(data["points"])}
+        for i, pt in enumerate(np.asarray(points, dtype=float)):
+            j = index.get(pt.tobytes())
+            if j is not None:
+                restore(states, i, data["entries"][j])
+    return states
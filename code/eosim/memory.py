@@ -0,0 +1,30 @@
+import psutil
+
+
+# bytes the working set of each of workers processes may take: the budget
+# in MiB, or half the available memory, less what a process already holds;
+# threads share one process, so they split what the process leaves. Without
+# a budget, None if that leaves nothing, and the batch and chunk are kept
+# as configured.
+def working_set(memory=None, workers=1, threads=False):
+    if memory is None:
+        budget = psutil.virtual_memory().available // 2
+    else:
+        budget = int(memory * 2**20)
+    rss = psutil.Process().memory_info().rss
+    size = (budget-rss) // workers if threads else budget//workers - rss
+    if size <= 0 and memory is None:
+        return None
+    if size <= 0:
+        raise ValueError(f"a memory budget of {budget/2**20:.0f} MiB leaves "
+            f"nothing beyond the {rss/2**20:.0f} MiB a process already holds")
+    return size
+
+
+# largest batch and chunk not above the given ones for which batch paths of
+# path_bytes, each advanced chunk steps of step_bytes at once, fit in size
+# bytes; the chunk shrinks first since short chunks cost little throughput
+def fit(size, batch, chunk, step_bytes, path_bytes=0):
+    chunk = max(1, min(chunk, (size//batch - path_bytes) // step_bytes))
+    batch = max(1, min(batch, size // (chunk*step_bytes + path_bytes)))
+    return batch, chunk
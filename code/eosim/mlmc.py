@@ -0,0 +1,173 @@
+import numpy as np
+from scipy.stats import norm
+
+from . import oop
+from .stats import RunningStats
+
+
+# level l of a hierarchy of the given number of levels steps by dt*2**(L-1-l)
+# so the finest level uses dt itself
+def level_dt(dt, levels, level):
+    return dt * 2**(levels-1-level)
+
+
+# work per sample relative to a level 0 path: a path costs 1/dt and level
+# l > 0 draws a fine and a coarse path
+def level_cost(level):
+    return 1. if level == 0 else 1.5 * 2**level
+
+
+# one resolution of a pair of coupled paths
+class Track():
+    def __init__(self, b0, n, domain, domain_v):
+        self.pos = np.tile(np.asarray(b0, dtype=float), (n, 1))
+        self.exit_idx = np.zeros(n, dtype=np.int_)
+        self.alive = np.ones(n, dtype=bool)
+        self.counts = np.zeros(n, dtype=np.int_)
+        if domain_v is not None:
+            self.counts += domain_v.indicator(self.pos)
+
+    def advance(self, active, zs, step, domain, domain_v, ws):
+        k = zs.shape[1]
+        pts = np.cumsum(zs, axis=1)
+        pts += self.pos[active, np.newaxis]
+        if domain_v is not None:
+            inside, inside_v = oop.fused_indicators(domain, domain_v, pts, ws)
+        else:
+            inside = domain.indicator(pts, ws)
+        rows = np.arange(active.size)
+        first = np.argmin(inside, axis=1)
+        running = self.alive[active]
+        exited = ~inside[rows, first] & running
+        if domain_v is not None:
+            stop = np.where(exited, first, np.where(running, k, 0))
+            inside_v &= np.arange(k) < stop[:, np.newaxis]
+            self.counts[active] += np.count_nonzero(inside_v, axis=1)
+        self.exit_idx[active[exited]] = step + 1 + first[exited]
+        self.alive[active[exited]] = False
+        self.pos[active] = pts[:, -1]
+
+
+# n pairs of paths from b0 stepping by dt and 2*dt, the coarse increments
+# being sums of consecutive pairs of fine ones; exit and occupation times of
+# the fine paths, then of the coarse ones
+def coupled_walk(b0, n, max_t, dt, chunk, rng, domain, domain_v=None,
+        dtype=float, ws=None):
+    if not np.all(domain.indicator(np.atleast_2d(b0))):
+        raise RuntimeError("exit time is out of reach")
+    fine = Track(b0, n, domain, domain_v)
+    coarse = Track(b0, n, domain, domain_v)
+    num = None if max_t is None else np.int_(np.rint(max_t/(2*dt)))
+    ws = oop.Workspace() if ws is None else ws
+    active = np.arange(n)
+    step = 0
+    while active.size:
+        k = chunk
+        if num is not None:
+            k = min(k, num-1-step)
+            if k <= 0:
+                raise RuntimeError("exit time is out of reach")
+        zs = rng.standard_normal((active.size, 2*k, np.size(b0)), dtype)
+        zs *= np.sqrt(dt)
+        fine.advance(active, zs, 2*step, domain, domain_v, ws)
+        coarse.advance(active, zs[:, ::2]+zs[:, 1::2], step, domain, domain_v,
+            ws)
+        active = active[fine.alive[active] | coarse.alive[active]]
+        step += k
+    return ((fine.exit_idx*dt, fine.counts*dt),
+        (coarse.exit_idx*2*dt, coarse.counts*2*dt))
+
+
+# statistics of the level's correction P_l - P_{l-1} (P_0 at level 0) and
+# of the plain values P_l
+def evaluate(sim, b0, m, rng, level):
+    domain, domain_v = sim.target
+    dt = level_dt(sim.dt, sim.levels, level)
+    if level == 0:
+        paths = oop.BrownianPaths(b0, m, sim.max_t, dt, sim.chunk, rng,
+            ws=sim.workspace(), dtype=sim.dtype)
+        exit_idx, counts = paths.walk([domain], domain_v)
+        values = sim.select(exit_idx[0]*dt, counts*dt)
+        return RunningStats.of(values), RunningStats.of(values)
+    fine, coarse = coupled_walk(b0, m, sim.max_t, dt, sim.chunk, rng, domain,
+        domain_v, sim.dtype, sim.workspace())
+    values = sim.select(*fine)
+    corrections = values - sim.select(*coarse)
+    return RunningStats.of(corrections), RunningStats.of(values)
+
+
+# samples per level before its variance is trusted
+pilot = 200
+
+
+# Giles' optimal allocation N_l proportional to sqrt(V_l/C_l), scaled so the
+# estimator's CI half-width is tol, starting from a pilot batch per level;
+# a gridpoint takes at most n samples over all levels, and once the
+# allocation asks for more the rest of them are shared out in proportion
+# to what each level still needs
+def schedule(sim, state, indices):
+    z = norm.ppf(0.5 + sim.confidence/2)
+    costs = np.array([level_cost(l) for l in range(sim.levels)])
+    first = max(min(pilot, sim.n // sim.levels), 2)
+    todo = {}
+    for i in indices:
+        counts = np.array([st.stats[i].count for st in state])
+        if np.any(counts == 0):
+            need = np.where(counts == 0, first, 0)
+        else:
+            var = np.array([st.stats[i].var for st in state])
+            total = np.sum(np.sqrt(var*costs))
+            target = np.ceil((z/sim.tol)**2 * np.sqrt(var/costs) * total)
+            need = np.maximum(target.astype(np.int_) - counts, 0)
+            left = max(sim.n - np.sum(counts), 0)
+            if np.sum(need) > left:
+                need = need * left // np.sum(need)
+        for level in np.flatnonzero(need):
+            todo[i, level] = need[level]
+    return todo
+
+
+# per level GridStates of the corrections; a task (i, k, m, l) draws the
+# k-th batch of m samples of level l at grid point i
+def estimate(sim, grid):
+    state = sim.states(grid, sim.levels)
+    todo = schedule(sim, state, range(len(grid)))
+    while todo:
+        tasks = []
+        for (i, level), need in todo.items():
+            for m in oop.batch_sizes(need, sim.batch):
+                tasks.append((i, state[level].batches[i], m, level))
+                state[level].batches[i] += 1
+        results = sim.run_tasks(grid, tasks)
+        for (i, _, _, level), (stats, raw) in zip(tasks, results):
+            state[level].stats[i].merge(stats)
+            state[level].raw[i].merge(raw)
+        sim.save(grid, state)
+        todo = schedule(sim, state, range(len(grid)))
+    sim.store(grid, state)
+    return state
+
+
+def means(state):
+    return np.sum([st.means() for st in state], axis=0)
+
+
+# the optimum over the grid and the report rows, comparing the cost with a
+# single level run at the finest dt reaching the same error
+def optimise(sim, grid):
+    state = estimate(sim, grid)
+    best = np.argmax(sim.sense*means(state))
+    z = norm.ppf(0.5 + sim.confidence/2)
+    counts = np.array([[st.stats[i].count for st in state]
+        for i in range(len(grid))])
+    var = sum(st.stats[best].var/st.stats[best].count for st in state)
+    cost = np.sum(counts[best] * [level_cost(l) for l in range(sim.levels)])
+    single = (z/sim.tol)**2 * state[-1].raw[best].var * 2**(sim.levels-1)
+    coarsest = level_dt(sim.dt, sim.levels, 0)
+    report = [
+        ["Error", f"±{z*np.sqrt(var):.3g} ({sim.confidence:.0%} CI)"],
+        ["Samples Used", f"{np.sum(counts)} over {len(grid)} gridpoints"],
+        ["MLMC", f"{sim.levels} levels, dt={coarsest:.3g} to {sim.dt:.3g}, "
+            f"{' / '.join(map(str, counts[best]))} samples"],
+        ["Cost Saving", f"x{single/cost:.3g} vs a single level"]]
+    return means(state)[best], report
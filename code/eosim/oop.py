@@ -1,57 +1,412 @@
+import hashlib
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
 
 import numpy as np
+from scipy.spatial import cKDTree
+from scipy.special import ndtri
+from scipy.stats import qmc
+
+from . import checkpoint, memory, mlmc, timing, wos
+from .cache import Cache
+from .stats import RunningStats
 
 
 rng = np.random.default_rng()
 
 
+# independent stream for batch k at point pt: SeedSequence(seed) spawns a
+# child per (point, batch) key, so results depend on the seed but not on
+# which worker draws the batch; without a seed every stream is fresh entropy.
+# Further keys, such as an MLMC level, extend the spawn key.
+def stream(seed, pt, k, *keys):
+    if seed is None:
+        return np.random.default_rng()
+    digest = hashlib.blake2b(np.asarray(pt, dtype=float).tobytes(),
+        digest_size=8).digest()
+    key = (int.from_bytes(digest, "little"), k, *keys)
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=key))
+
+
+# named scratch buffers that grow on demand and are reused across calls;
+# a buffer's contents are only valid until it is requested again
+class Workspace():
+    def __init__(self):
+        self.buffers = {}
+
+    def buffer(self, name, shape, dtype=float):
+        size = np.prod(shape, dtype=np.int_)
+        buf = self.buffers.get(name)
+        if buf is None or buf.size < size or buf.dtype != dtype:
+            buf = self.buffers[name] = np.empty(size, dtype=dtype)
+        return buf[:size].reshape(shape)
+
+
+# squared distances of pts from c, accumulated one coordinate at a time so
+# no (..., dim) temporary is allocated
+def sq_radii(pts, c, ws):
+    shape = pts.shape[:-1]
+    sq = ws.buffer("sq", shape, pts.dtype)
+    tmp = ws.buffer("tmp", shape, pts.dtype)
+    sq[...] = 0.
+    for j, cj in enumerate(np.broadcast_to(c, pts.shape[-1:])):
+        np.subtract(pts[..., j], cj, out=tmp)
+        np.multiply(tmp, tmp, out=tmp)
+        sq += tmp
+    return sq
+
+
+def within(sq, bounds, ws, name="inside"):
+    lo, hi = bounds
+    inside = ws.buffer(name, sq.shape, bool)
+    upper = ws.buffer("upper", sq.shape, bool)
+    np.greater(sq, lo, out=inside)
+    np.less(sq, hi, out=upper)
+    inside &= upper
+    return inside
+
+
+# indicators of D and V in one pass; radial domains with a common centre
+# share one evaluation of the squared radii
+def fused_indicators(domain_d, domain_v, pts, ws):
+    if (domain_d.sq_bounds is not None and domain_v.sq_bounds is not None
+            and np.array_equal(domain_d.c, domain_v.c)):
+        sq = sq_radii(pts, domain_d.c, ws)
+        return (within(sq, domain_d.sq_bounds, ws, "inside_d"),
+            within(sq, domain_v.sq_bounds, ws, "inside_v"))
+    inside_d = ws.buffer("inside_d", pts.shape[:-1], bool)
+    np.copyto(inside_d, domain_d.indicator(pts, ws))
+    return inside_d, domain_v.indicator(pts, ws)
+
+
+# Brownian bridge crossings: a step between points at distances d0 and d1
+# inside the boundary has left the domain in between with probability
+# exp(-2*d0*d1/dt), taking the boundary to be flat near the path
+def crossed(d0, d1, dt, rng):
+    p = np.exp(-2 * np.maximum(d0, 0) * np.maximum(d1, 0) / dt)
+    return rng.random(np.shape(p)) < p
+
+
 class BrownianMotion():
     def __init__(self, b0, max_t, dt):
         self.dt = dt
         num = np.int_(np.rint(max_t/dt))
-        increments = rng.normal(0., np.sqrt(dt), size=(num-1, np.size(b0)))
-        self.bts = np.cumsum(np.insert(increments, 0, b0, axis=0), axis=0)
+        with timing.phase("rng"):
+            increments = rng.normal(0., np.sqrt(dt),
+                size=(num-1, np.size(b0)))
+        with timing.phase("cumsum"):
+            self.bts = np.cumsum(np.insert(increments, 0, b0, axis=0), axis=0)
 
-    def get_exit_time(self, indicator):
-        bool_arr = indicator(self.bts)
+    # with the distance to the boundary, steps crossing it unobserved count
+    # as exits
+    def get_exit_time(self, indicator, distance=None):
+        with timing.phase("indicator"):
+            bool_arr = indicator(self.bts)
+        if distance is not None:
+            ds = distance(self.bts)
+            bool_arr[1:] &= ~crossed(ds[:-1], ds[1:], self.dt, rng)
         idx = np.argmin(bool_arr)
         if idx == 0:
             raise RuntimeError("exit time is out of reach")
         return idx * self.dt
 
     def get_occupation_time(self, indicator, stop_time):
-        bool_arr = indicator(self.bts)
+        with timing.phase("indicator"):
+            bool_arr = indicator(self.bts)
         idx = np.int_(np.rint(stop_time/self.dt))
         return np.sum(bool_arr[:idx]) * self.dt
 
 
+# Brownian bridge construction of the given number of steps: the end point
+# first, then midpoints of the gaps between known points, as triples (index,
+# left, right) of the point and its known neighbours
+def bridge_order(steps):
+    order = [(steps, 0, 0)]
+    gaps = [(0, steps)]
+    for left, right in gaps:
+        if right - left > 1:
+            mid = (left+right) // 2
+            order.append((mid, left, right))
+            gaps += [(left, mid), (mid, right)]
+    return order
+
+
+# increments of n paths over the given number of steps from scrambled Sobol
+# points, mapped through the inverse normal CDF and assigned in Brownian
+# bridge order so the leading, best distributed coordinates fix the coarse
+# shape of the paths
+def sobol_increments(n, steps, dim, dt, rng):
+    sobol = qmc.Sobol(steps*dim, seed=rng)
+    us = sobol.random_base2(np.int_(np.ceil(np.log2(n))))[:n]
+    zs = ndtri(us).reshape(n, steps, dim).transpose(1, 0, 2).copy()
+    ws = np.zeros((steps+1, n, dim))
+    for j, (idx, left, right) in enumerate(bridge_order(steps)):
+        if j == 0:
+            ws[idx] = np.sqrt(steps) * zs[j]
+            continue
+        w = (idx-left) / (right-left)
+        std = np.sqrt((idx-left) * (right-idx) / (right-left))
+        ws[idx] = (1-w)*ws[left] + w*ws[right] + std*zs[j]
+    return np.diff(ws, axis=0).transpose(1, 0, 2) * np.sqrt(dt)
+
+
+# n paths started at b0, advanced chunk steps at a time; paths leave the
+# active set as soon as they have exited every domain, and max_t=None
+# removes the time cap. With antithetic=True path j+n/2 mirrors path j; with
+# qmc=True the first qmc_steps increments come from scrambled Sobol points.
+# Increments and positions are held in dtype. With bridge=True a step also
+# exits a domain if its Brownian bridge crosses the boundary.
+class BrownianPaths():
+    qmc_steps = 128
+
+    def __init__(self, b0, n, max_t, dt, chunk=32, rng=rng, antithetic=False,
+            ws=None, qmc=False, dtype=float, bridge=False):
+        if antithetic and n % 2:
+            raise ValueError("antithetic paths come in pairs")
+        if antithetic and qmc:
+            raise ValueError("antithetic paths are pseudo-random")
+        self.rng = rng
+        self.b0 = np.asarray(b0, dtype=float)
+        self.n = n
+        self.dt = dt
+        self.num = None if max_t is None else np.int_(np.rint(max_t/dt))
+        self.chunk = chunk
+        self.antithetic = antithetic
+        self.ws = Workspace() if ws is None else ws
+        self.dtype = dtype
+        self.bridge = bridge
+        self.sobol = None
+        if qmc:
+            steps = self.qmc_steps if self.num is None else self.num-1
+            # scipy's Sobol sequence has at most 21201 dimensions
+            steps = min(steps, self.qmc_steps, 21201 // np.size(self.b0))
+            self.sobol = sobol_increments(n, steps, np.size(self.b0), dt, rng)
+
+    def increments(self, active, k, step=0):
+        size = (active.size, k, np.size(self.b0))
+        if self.sobol is not None:
+            h = min(k, max(self.sobol.shape[1]-step, 0))
+            zs = self.ws.buffer("pts", size, self.dtype)
+            zs[:, :h] = self.sobol[active, step:step+h]
+            zs[:, h:] = self.rng.normal(0., np.sqrt(self.dt),
+                size=(active.size, k-h, size[-1]))
+            return zs
+        if not self.antithetic:
+            zs = self.ws.buffer("pts", size, self.dtype)
+            self.rng.standard_normal(dtype=self.dtype, out=zs)
+            zs *= np.sqrt(self.dt)
+            return zs
+        half = self.n // 2
+        pairs, inverse = np.unique(active % half, return_inverse=True)
+        zs = self.rng.standard_normal((pairs.size,)+size[1:], self.dtype)
+        zs *= np.sqrt(self.dt)
+        zs = zs[inverse]
+        zs[active >= half] *= -1
+        return zs
+
+    # exit indices from each of the domains and the number of steps spent
+    # in domain_v before exiting the first one
+    def walk(self, domains, domain_v=None):
+        pos = np.tile(self.b0, (self.n, 1))
+        if not all(np.all(domain.indicator(pos)) for domain in domains):
+            raise RuntimeError("exit time is out of reach")
+        exit_idx = np.zeros((len(domains), self.n), dtype=np.int_)
+        alive = np.ones((len(domains), self.n), dtype=bool)
+        counts = np.zeros(self.n, dtype=np.int_)
+        if domain_v is not None:
+            counts += domain_v.indicator(pos)
+        active = np.arange(self.n)
+        step = 0
+        while active.size:
+            k = self.chunk
+            if self.num is not None:
+                k = min(k, self.num-1-step)
+                if k <= 0:
+                    raise RuntimeError("exit time is out of reach")
+            with timing.phase("rng"):
+                pts = self.increments(active, k, step)
+            with timing.phase("cumsum"):
+                np.cumsum(pts, axis=1, out=pts)
+                pts += pos[:, np.newaxis]
+            rows = np.arange(active.size)
+            for j, domain in enumerate(domains):
+                with timing.phase("indicator"):
+                    if j == 0 and domain_v is not None:
+                        inside, inside_v = fused_indicators(domain, domain_v,
+                            pts, self.ws)
+                    else:
+                        inside = domain.indicator(pts, self.ws)
+                if self.bridge:
+                    with timing.phase("bridge"):
+                        ds = domain.distance(pts)
+                        d0 = np.concatenate([domain.distance(pos)[:, None],
+                            ds[:, :-1]], axis=1)
+                        inside &= ~crossed(d0, ds, self.dt, self.rng)
+                with timing.phase("reduction"):
+                    first = np.argmin(inside, axis=1)
+                    running = alive[j, active]
+                    exited = ~inside[rows, first] & running
+                    if j == 0 and domain_v is not None:
+                        stop = np.where(exited, first,
+                            np.where(running, k, 0))
+                        before = self.ws.buffer("before", inside.shape, bool)
+                        np.less(np.arange(k), stop[:, np.newaxis], out=before)
+                        inside_v &= before
+                        counts[active] += np.count_nonzero(inside_v, axis=1)
+                    exit_idx[j, active[exited]] = step + 1 + first[exited]
+                    alive[j, active[exited]] = False
+            keep = np.any(alive[:, active], axis=0)
+            pos = pts[keep, -1]
+            active = active[keep]
+            step += k
+        return exit_idx, counts
+
+    # exit indices from each of the radial domains about a common centre in
+    # one pass: a path has left the domain with squared radii (lo, hi) once
+    # the running maximum of its squared radius reaches hi or the running
+    # minimum reaches lo, so the index is the number of positions before
+    # that; it is 0 for domains not containing b0. Domains sharing lo, such
+    # as balls, are ranked by hi so one search per position serves them all.
+    def sweep(self, domains):
+        c = domains[0].c
+        bounds = np.array([domain.sq_bounds for domain in domains])
+        groups = []
+        for lo in np.unique(bounds[:, 0]):
+            idx = np.flatnonzero(bounds[:, 0] == lo)
+            idx = idx[np.argsort(bounds[idx, 1], kind="stable")]
+            groups.append((lo, idx, bounds[idx, 1]))
+        pos = np.tile(self.b0, (self.n, 1))
+        sq0 = np.sum((self.b0 - c)**2)
+        running_max = np.full(self.n, sq0, dtype=self.dtype)
+        running_min = np.full(self.n, sq0, dtype=self.dtype)
+        # a ball's lower bound of -1 is never reached
+        track_min = np.any(bounds[:, 0] >= 0)
+        alive = (bounds[:, 0] < sq0) & (sq0 < bounds[:, 1])
+        alive = np.repeat(alive[:, np.newaxis], self.n, axis=1)
+        exit_idx = alive.astype(np.int_)
+        active = np.arange(self.n) if np.any(alive) else np.arange(0)
+        step = 0
+        while active.size:
+            k = self.chunk
+            if self.num is not None:
+                k = min(k, self.num-1-step)
+                if k <= 0:
+                    raise RuntimeError("exit time is out of reach")
+            with timing.phase("rng"):
+                pts = self.increments(active, k, step)
+            with timing.phase("cumsum"):
+                np.cumsum(pts, axis=1, out=pts)
+                pts += pos[:, np.newaxis]
+            with timing.phase("indicator"):
+                sq = sq_radii(pts, c, self.ws)
+                most = self.ws.buffer("most", sq.shape, sq.dtype)
+                least = self.ws.buffer("least", sq.shape, sq.dtype)
+                np.maximum(sq, running_max[active, np.newaxis], out=most)
+                np.maximum.accumulate(most, axis=1, out=most)
+                if track_min:
+                    np.minimum(sq, running_min[active, np.newaxis], out=least)
+                    np.minimum.accumulate(least, axis=1, out=least)
+            with timing.phase("reduction"):
+                # rank of a position among a group: the number of its
+                # domains left, all of them once below lo
+                offsets = np.arange(active.size)[:, np.newaxis]
+                for lo, idx, his in groups:
+                    rank = np.searchsorted(his, most, side="right")
+                    if lo >= 0:
+                        rank[least <= lo] = idx.size
+                    alive[np.ix_(idx, active)] = (rank[:, -1]
+                        <= np.arange(idx.size)[:, np.newaxis])
+                    rank += offsets * (idx.size+1)
+                    hist = np.bincount(rank.ravel(),
+                        minlength=active.size*(idx.size+1))
+                    inside = np.cumsum(hist.reshape(active.size, -1)[:, :-1],
+                        axis=1)
+                    exit_idx[np.ix_(idx, active)] += inside.T
+                running_max[active] = most[:, -1]
+                if track_min:
+                    running_min[active] = least[:, -1]
+            keep = np.any(alive[:, active], axis=0)
+            pos = pts[keep, -1]
+            active = active[keep]
+            step += k
+        return exit_idx
+
+    def get_exit_idx(self, domain):
+        exit_idx, _ = self.walk([domain])
+        return exit_idx[0]
+
+    def get_exit_times(self, domain):
+        return self.get_exit_idx(domain) * self.dt
+
+    def get_occupation_times(self, domain_d, domain_v):
+        _, counts = self.walk([domain_d], domain_v)
+        return counts * self.dt
+
+
+def batch_sizes(n, batch):
+    return [batch] * (n // batch) + ([n % batch] if n % batch else [])
+
+
 class Domain(ABC):
+    # isometries about self.c that leave the domain invariant: None,
+    # "hyperoctahedral" (signed coordinate permutations) or "rotation"
+    symmetry = None
+    # open interval of squared distances from self.c that make up a radial
+    # domain, or None
+    sq_bounds = None
+    # scratch bytes per point the indicator holds beyond the squared radii
+    # and flags of a radial domain
+    step_bytes = 0
+
     @abstractmethod
     def __str__(self):
         pass
 
+    # the result may live in a buffer of ws, valid until ws is reused
     @abstractmethod
-    def indicator(self, pts):
+    def indicator(self, pts, ws=None):
         pass
 
     @abstractmethod
     def generate_grid(self, dx):
         pass
 
+    # smallest ball containing the domain, used as a control variate
+    @abstractmethod
+    def enclosing_ball(self):
+        pass
+
+    # distance to the boundary, positive inside and negative outside
+    def distance(self, pts):
+        raise NotImplementedError(
+            f"{type(self).__name__} has no distance to its boundary")
+
+    # signed value whose magnitude never exceeds the distance to the
+    # boundary, 0 where unknown
+    def bound(self, pts):
+        return self.distance(pts)
+
+    # corners of a box containing the domain
+    def box(self):
+        ball = self.enclosing_ball()
+        return np.asarray(ball.c) - ball.r, np.asarray(ball.c) + ball.r
+
 
 class OpenBall(Domain):
+    symmetry = "rotation"
+
     def __init__(self, c, r):
         self.dim = np.size(c)
         self.c = c
         self.r = r
+        self.sq_bounds = (-1., r**2)
 
     def __str__(self):
         return f"{type(self).__name__} ({self.c}, {self.r})"
 
-    def indicator(self, pts):
-        c_distances = np.linalg.norm(pts-self.c, axis=1)
-        return c_distances < self.r
+    def indicator(self, pts, ws=None):
+        ws = Workspace() if ws is None else ws
+        return within(sq_radii(pts, self.c, ws), self.sq_bounds, ws)
 
     def generate_grid(self, dx):
         xs = np.linspace(-self.r, self.r, np.int_(np.rint(2*self.r/dx))+1)
@@ -60,20 +415,33 @@ class OpenBall(Domain):
         idx = np.nonzero(self.indicator(grid))
         return grid[idx]
 
+    def enclosing_ball(self):
+        return self
+
+    def distance(self, pts):
+        return self.r - np.linalg.norm(pts-self.c, axis=-1)
+
+    def expected_exit_time(self, pts):
+        c_distances = np.linalg.norm(pts-self.c, axis=-1)
+        return (self.r**2 - c_distances**2) / self.dim
+
 
 class OpenAnnulus(Domain):
+    symmetry = "rotation"
+
     def __init__(self, c, r1, r2):
         self.dim = np.size(c)
         self.c = c
         self.r1 = r1
         self.r2 = r2
+        self.sq_bounds = (r1**2, r2**2)
 
     def __str__(self):
         return f"{type(self).__name__} ({self.c}, {self.r1}, {self.r2})"
 
-    def indicator(self, pts):
-        c_distances = np.linalg.norm(pts-self.c, axis=1)
-        return (self.r1<c_distances) & (c_distances<self.r2)
+    def indicator(self, pts, ws=None):
+        ws = Workspace() if ws is None else ws
+        return within(sq_radii(pts, self.c, ws), self.sq_bounds, ws)
 
     def generate_grid(self, dx):
         xs = np.linspace(-self.r2, self.r2, np.int_(np.rint(2*self.r2/dx))+1)
@@ -82,13 +450,598 @@ class OpenAnnulus(Domain):
         idx = np.nonzero(self.indicator(grid))
         return grid[idx]
 
+    def enclosing_ball(self):
+        return OpenBall(self.c, self.r2)
+
+    def distance(self, pts):
+        c_distances = np.linalg.norm(pts-self.c, axis=-1)
+        return np.minimum(c_distances-self.r1, self.r2-c_distances)
+
+
+# bits of the bit-packed array bits, the shift-th (from the most
+# significant) of the bytes at the given indices
+def packed_bits(bits, byte, shift, out, ws):
+    tmp = ws.buffer("bits", byte.shape, np.uint8)
+    np.take(bits, byte, out=tmp)
+    np.left_shift(tmp, shift, out=tmp)
+    np.bitwise_and(tmp, 0x80, out=tmp)
+    return np.not_equal(tmp, 0, out=out)
+
+
+# a domain looked up in a bit-packed grid of voxels covering its box, so an
+# indicator costs the same however complex the domain: a voxel is inside,
+# outside or, near the boundary, in a narrow band whose points are tested
+# exactly. Subclasses set the box and voxels and call build.
+class VoxelDomain(Domain):
+    # voxels along the longest side of the box
+    resolution = 128
+    step_bytes = 24
+
+    def __init__(self, lo, hi):
+        self.lo = np.asarray(lo, dtype=float)
+        self.hi = np.asarray(hi, dtype=float)
+        self.dim = self.lo.size
+        self.c = (self.lo + self.hi) / 2
+        self.h = max(np.max(self.hi - self.lo), 1e-12) / self.resolution
+        self.shape = tuple(max(int(np.ceil(side / self.h)), 1)
+            for side in self.hi - self.lo)
+        self.bits = None
+        self.band = None
+
+    # classify the voxels by a bound on the distance to the boundary at
+    # their centres: beyond half a voxel diagonal the whole voxel is on one
+    # side, built a slab of voxels at a time
+    def build(self):
+        size = np.prod(self.shape)
+        inside = np.empty(size, dtype=bool)
+        band = np.empty(size, dtype=bool)
+        half = self.h * np.sqrt(self.dim) / 2
+        for start in range(0, size, 2**16):
+            flat = np.arange(start, min(start + 2**16, size))
+            cells = np.stack(np.unravel_index(flat, self.shape), axis=-1)
+            bound = self.bound(self.lo + self.h*(cells+0.5))
+            inside[flat] = bound > 0
+            band[flat] = np.abs(bound) <= half
+        self.bits = np.packbits(inside)
+        self.band = np.packbits(band)
+
+    def box(self):
+        return self.lo, self.hi
+
+    # membership of points in the narrow band
+    def exact(self, pts):
+        raise NotImplementedError(
+            f"{type(self).__name__} has no exact indicator")
+
+    def indicator(self, pts, ws=None):
+        ws = Workspace() if ws is None else ws
+        shape = pts.shape[:-1]
+        idx = ws.buffer("voxel", shape, np.int_)
+        valid = ws.buffer("valid", shape, bool)
+        cell = ws.buffer("cell", shape, pts.dtype)
+        idx[...] = 0
+        valid[...] = True
+        for j, n in enumerate(self.shape):
+            np.subtract(pts[..., j], self.lo[j], out=cell)
+            cell *= 1 / self.h
+            valid &= cell >= 0
+            valid &= cell < n
+            # truncating the clipped cell rounds it down
+            np.clip(cell, 0, n-1, out=cell)
+            idx *= n
+            np.add(idx, cell, out=idx, casting="unsafe")
+        byte = ws.buffer("byte", shape, np.int_)
+        shift = ws.buffer("shift", shape, np.uint8)
+        np.right_shift(idx, 3, out=byte)
+        np.bitwise_and(idx, 7, out=shift, casting="unsafe")
+        inside = packed_bits(self.bits, byte, shift,
+            ws.buffer("inside", shape, bool), ws)
+        inside &= valid
+        if self.band is not None:
+            band = packed_bits(self.band, byte, shift,
+                ws.buffer("band", shape, bool), ws)
+            band &= valid
+            if np.any(band):
+                inside[band] = self.exact(pts[band])
+        return inside
+
+    def generate_grid(self, dx):
+        xxs = [np.linspace(lo, hi, np.int_(np.rint((hi-lo)/dx))+1)
+            for lo, hi in zip(self.lo, self.hi)]
+        grid = np.array(np.meshgrid(*xxs)).T.reshape(-1, self.dim)
+        idx = np.nonzero(self.indicator(grid))
+        return grid[idx]
+
+    def enclosing_ball(self):
+        return OpenBall(self.c, np.linalg.norm(self.hi - self.lo) / 2)
+
+
+# a boolean array, or a .npy file holding one, whose element i covers the
+# voxel [origin + spacing*i, origin + spacing*(i+1)); it is its own exact
+# indicator, so it has no narrow band
+class Mask(VoxelDomain):
+    def __init__(self, origin, spacing, mask):
+        self.file = mask if isinstance(mask, str) else None
+        mask = np.load(mask) if isinstance(mask, str) else np.asarray(mask)
+        origin = np.broadcast_to(np.asarray(origin, dtype=float), mask.ndim)
+        super().__init__(origin, origin + spacing*np.array(mask.shape))
+        self.h = spacing
+        self.shape = mask.shape
+        self.bits = np.packbits(mask.astype(bool).ravel())
+
+    def __str__(self):
+        digest = hashlib.blake2b(self.bits, digest_size=8).hexdigest()
+        mask = f"{self.file or 'array'} {self.shape} {digest}"
+        return f"{type(self).__name__} ({self.lo}, {self.h}, {mask})"
+
+    # unknown inside the box and the distance to the box outside it
+    def bound(self, pts):
+        outside = np.maximum(np.maximum(self.lo - pts, pts - self.hi), 0)
+        return -np.linalg.norm(outside, axis=-1)
+
+
+# a set operation on domains, tested exactly in the narrow band by their
+# own indicators; bounds and distances combine by max for unions and min
+# for intersections, which never overestimates the distance to the boundary
+class Composite(VoxelDomain):
+    def __init__(self, *domains):
+        self.domains = domains
+        super().__init__(*self.combine_boxes([d.box() for d in domains]))
+        self.build()
+
+    def __str__(self):
+        domains = ", ".join(map(str, self.domains))
+        return f"{type(self).__name__} ({domains})"
+
+    @abstractmethod
+    def combine_boxes(self, boxes):
+        pass
+
+    # combine the domains' indicators, bounds or distances
+    @abstractmethod
+    def combine(self, values, inside):
+        pass
+
+    def exact(self, pts):
+        return self.combine([d.indicator(pts) for d in self.domains], True)
+
+    def bound(self, pts):
+        return self.combine([d.bound(pts) for d in self.domains], False)
+
+    def distance(self, pts):
+        return self.combine([d.distance(pts) for d in self.domains], False)
+
+
+class Union(Composite):
+    def combine_boxes(self, boxes):
+        los, his = zip(*boxes)
+        return np.min(los, axis=0), np.max(his, axis=0)
+
+    def combine(self, values, inside):
+        return np.any(values, axis=0) if inside else np.max(values, axis=0)
+
+
+class Intersection(Composite):
+    def combine_boxes(self, boxes):
+        los, his = zip(*boxes)
+        return np.max(los, axis=0), np.maximum(np.min(his, axis=0),
+            np.max(los, axis=0))
+
+    def combine(self, values, inside):
+        return np.all(values, axis=0) if inside else np.min(values, axis=0)
+
+
+# the first domain without the others
+class Difference(Composite):
+    def combine_boxes(self, boxes):
+        return boxes[0]
+
+    def combine(self, values, inside):
+        first, *rest = values
+        if inside:
+            return first & ~np.any(rest, axis=0)
+        return np.min([first, *(-v for v in rest)], axis=0)
+
+
+# the symmetry shared by all domains, which must have a common centre
+def common_symmetry(domains):
+    symmetries = {domain.symmetry for domain in domains}
+    centres = {tuple(np.ravel(domain.c)) for domain in domains
+        if domain.symmetry is not None}
+    if None in symmetries or len(centres) != 1:
+        return None
+    return "rotation" if symmetries == {"rotation"} else "hyperoctahedral"
+
+
+# indices of one representative per equivalence class of grid points
+# under the symmetry, and the class of every grid point
+def reduce_grid(grid, c, symmetry):
+    if symmetry is None:
+        return np.arange(len(grid)), np.arange(len(grid))
+    offsets = np.abs(grid - c)
+    if symmetry == "rotation":
+        keys = np.sum(offsets**2, axis=-1, keepdims=True)
+    else: # symmetry == "hyperoctahedral"
+        keys = np.sort(offsets, axis=-1)
+    _, reps, labels = np.unique(np.round(keys, 9), axis=0,
+        return_index=True, return_inverse=True)
+    return reps, labels.ravel()
+
+
+# per grid point estimator statistics and number of batches drawn so far
+class GridState():
+    def __init__(self, size):
+        self.stats = [RunningStats() for _ in range(size)]
+        self.raw = [RunningStats() for _ in range(size)]
+        self.batches = np.zeros(size, dtype=np.int_)
+
+    def means(self):
+        return np.array([st.mean for st in self.stats])
+
 
 class Simulator(ABC):
-    def __init__(self, max_t, dt, dx, n):
+    def __init__(self, max_t, dt, dx, n, batch=1000, chunk=32, seed=None,
+            tol=None, confidence=0.95, antithetic=False,
+            control_variate=False, symmetry=False, search=False,
+            engine="euler", eps=1e-3, mlmc=False, levels=4, qmc=False,
+            memory=None, float32=False, checkpoint=None, cache=None,
+            cache_size=64, profile=False, bridge=False):
+        if engine == "wos" and (antithetic or control_variate or qmc):
+            raise ValueError("walk on spheres supports neither antithetic "
+                "paths, control variates nor QMC")
+        if control_variate and not bridge:
+            raise ValueError("control variates need bridge=True: the plain "
+                "Euler exit time from the ball is O(sqrt(dt)) off its "
+                "analytic mean, and the control would carry that bias into "
+                "the estimate")
+        if qmc and (antithetic or mlmc):
+            raise ValueError("QMC paths are neither antithetic nor MLMC")
+        if qmc and n < 4:
+            raise ValueError("QMC needs n of at least 4 for two replicates "
+                "of two paths")
+        if mlmc and (tol is None or engine != "euler" or antithetic
+                or control_variate or search or bridge):
+            raise ValueError("MLMC needs a tolerance and plain euler paths "
+                "without search")
+        if mlmc and n < 2*levels:
+            raise ValueError("MLMC needs n of at least two samples per level")
         self.max_t = max_t
         self.dt = dt
         self.dx = dx
         self.n = n
+        self.batch = batch
+        self.chunk = chunk
+        self.seed = seed
+        self.tol = tol
+        self.confidence = confidence
+        self.antithetic = antithetic
+        self.control_variate = control_variate
+        self.symmetry = symmetry
+        self.search = search
+        self.engine = engine
+        self.eps = eps
+        self.mlmc = mlmc
+        self.levels = levels
+        self.qmc = qmc
+        self.memory = memory
+        self.dtype = np.float32 if float32 else float
+        self.checkpoint = checkpoint
+        self.cache = None if cache is None else Cache(cache, cache_size)
+        self.profile = profile
+        self.bridge = bridge
+        # report rows on how the run was set up, by title
+        self.notes = {}
+        self.report = []
+
+    # processes sampling at once, each holding one batch, or threads of
+    # this process
+    workers = 1
+    threads = False
+
+    # with profile, time the phases of a run or estimate as "run"
+    @contextmanager
+    def profiled(self):
+        timing.enabled = self.profile
+        if self.profile:
+            timing.reset()
+        try:
+            with timing.phase("run"):
+                yield
+        finally:
+            timing.enabled = False
+
+    # everything the samples at a point depend on besides their number
+    def signature(self):
+        settings = [self.name, *self.domains, self.max_t, self.dt,
+            self.seed, self.antithetic, self.control_variate, self.engine,
+            self.eps, self.qmc and self.batch, self.mlmc and self.levels,
+            np.dtype(self.dtype), self.bridge]
+        return " ".join(map(str, settings))
+
+    # n_states GridStates of grid, resumed from the checkpoint if it exists
+    # and otherwise from the cache
+    def states(self, grid, n_states=1):
+        signature = self.signature()
+        states = checkpoint.load(self.checkpoint, signature, grid, n_states)
+        if self.cache is None:
+            return states
+        hits = 0
+        for i, pt in enumerate(grid):
+            if any(state.stats[i].count for state in states):
+                continue
+            entry = self.cache.get(signature, pt)
+            if entry is not None and len(entry) == n_states:
+                checkpoint.restore(states, i, entry)
+                hits += 1
+        self.notes["Cache"] = f"{hits} of {len(grid)} gridpoints reused"
+        return states
+
+    def save(self, grid, states):
+        if self.checkpoint is not None:
+            checkpoint.save(self.checkpoint, self.signature(), grid, states)
+
+    def store(self, grid, states):
+        if self.cache is None:
+            return
+        for i, pt in enumerate(grid):
+            if any(state.stats[i].count for state in states):
+                self.cache.put(self.signature(), pt,
+                    checkpoint.entry(states, i))
+        self.cache.evict()
+
+    # shrink the chunk, then the batch, until the paths of all workers fit
+    # the memory budget: per step a path holds its increments, squared radii
+    # and indicators, and MLMC walks a fine and a coarse path at once;
+    # extra_bytes and the domains' indicator scratch come on top of that
+    def fit_memory(self, dim, extra_bytes=0):
+        itemsize = np.dtype(self.dtype).itemsize
+        step_bytes = (dim+2)*itemsize + 4 + extra_bytes
+        step_bytes += max(domain.step_bytes for domain in self.domains)
+        path_bytes = (dim+3) * 8
+        if self.qmc:
+            path_bytes += 4 * BrownianPaths.qmc_steps * dim * 8
+        if self.mlmc:
+            step_bytes *= 3
+        size = memory.working_set(self.memory, self.workers, self.threads)
+        if size is not None:
+            batch, chunk = memory.fit(size, self.batch, self.chunk,
+                step_bytes, path_bytes)
+            if self.antithetic:
+                batch = max(batch - batch%2, 2)
+            if (batch, chunk) != (self.batch, self.chunk):
+                self.batch, self.chunk = batch, chunk
+                self.notes["Memory"] = (f"batch={batch}, chunk={chunk} to "
+                    f"fit {size/2**20:.0f} MiB per worker")
+        if self.qmc:
+            self.fit_replicates()
+
+    # QMC replicates of a power of two points, which keeps the Sobol points
+    # balanced, and at least two of them within n
+    def fit_replicates(self):
+        batch = 2 ** int(np.log2(min(self.batch, self.n // 2)))
+        if batch != self.batch:
+            self.batch = batch
+            self.notes["QMC"] = (f"batch={batch}, {self.n // batch} "
+                "replicates")
+
+    # paths per independent sample; antithetic pairs count as one and with
+    # QMC each batch is one randomised replicate
+    @property
+    def unit(self):
+        if self.qmc:
+            return self.batch
+        return 2 if self.antithetic else 1
+
+    # scratch buffers for the paths of a batch; each batch gets its own
+    # unless a backend keeps them for reuse
+    def workspace(self):
+        return Workspace()
+
+    def paths(self, b0, m, rng):
+        return BrownianPaths(b0, m, self.max_t, self.dt, self.chunk, rng,
+            self.antithetic, self.workspace(), self.qmc, self.dtype,
+            self.bridge)
+
+    # exit times from domain, occupation times of domain_v before that and,
+    # for the control variate, exit times from the enclosing ball minus
+    # their analytic mean, off zero by the bridged walk's O(dt) bias;
+    # "euler" steps paths by dt, "wos" walks on spheres
+    def walk(self, b0, m, rng, domain, domain_v=None):
+        if self.engine == "wos":
+            with timing.phase("walk on spheres"):
+                times, counts = wos.walk(b0, m, domain, domain_v, self.eps,
+                    rng)
+            return times, counts, None
+        domains = [domain]
+        ball = domain.enclosing_ball() if self.control_variate else None
+        if ball is not None and ball is not domain:
+            domains.append(ball)
+        exit_idx, counts = self.paths(b0, m, rng).walk(domains, domain_v)
+        control = None
+        if ball is not None:
+            control = exit_idx[-1]*self.dt - ball.expected_exit_time(b0)
+        return exit_idx[0] * self.dt, counts * self.dt, control
+
+    # the simulated quantity out of exit and occupation times
+    @abstractmethod
+    def select(self, exit_times, occupation_times):
+        pass
+
+    # m samples at b0 and the matching control variate deviations (or None)
+    def sample(self, b0, m, rng):
+        exit_times, occupation_times, control = self.walk(b0, m, rng,
+            *self.target)
+        return self.select(exit_times, occupation_times), control
+
+    # statistics of the estimator's independent samples and of the plain
+    # samples, whose ratio of variances is the variance reduction; with a
+    # level, of that MLMC level's corrections instead
+    def evaluate(self, b0, m, rng, level=None):
+        if level is not None:
+            return mlmc.evaluate(self, b0, m, rng, level)
+        values, control = self.sample(b0, m, rng)
+        with timing.phase("statistics"):
+            raw = RunningStats.of(values)
+            if control is not None and np.var(control) > 0:
+                beta = np.cov(values, control)[0, 1] / np.var(control, ddof=1)
+                values = values - beta*control
+            return RunningStats.of(self.replicates(values)), raw
+
+    # independent samples out of a batch of paths' values: the means of
+    # antithetic pairs, or with QMC the mean of the whole batch
+    def replicates(self, values):
+        if self.antithetic:
+            values = (values[:values.size//2] + values[values.size//2:]) / 2
+        if self.qmc:
+            values = np.mean(values, keepdims=True)
+        return values
+
+    # a task (i, k, m) draws the k-th batch of m paths at grid point i, and
+    # (i, k, m, l) does so at MLMC level l
+    def run_tasks(self, grid, tasks):
+        return [self.evaluate(grid[i], m, stream(self.seed, grid[i], k, *l),
+            *l) for i, k, m, *l in tasks]
+
+    # number of further paths each of the grid points needs to reach cap
+    # paths or, with a tolerance, to bring its CI half-width below tol,
+    # starting from one pilot batch, or two replicates with QMC
+    def schedule(self, state, indices, cap):
+        todo = {}
+        cap, batch = cap // self.unit, max(self.batch // self.unit, 2)
+        for i in indices:
+            st = state.stats[i]
+            if self.tol is None:
+                need = cap - st.count
+            elif st.count == 0:
+                need = min(batch, cap)
+            elif st.half_width(self.confidence) <= self.tol:
+                need = 0
+            else:
+                ratio = st.half_width(self.confidence) / self.tol
+                target = np.int_(np.ceil(st.count * ratio**2))
+                need = min(cap-st.count, max(target-st.count, batch))
+            if need > 0:
+                todo[i] = need * self.unit
+        return todo
+
+    # batches a gridpoint draws per round with a checkpoint, which is saved
+    # after every round, so a fixed n is spread over several; a round still
+    # holds a task for every worker, and without a checkpoint it holds all
+    round_batches = 4
+
+    def round_size(self, points):
+        if self.checkpoint is None:
+            return None
+        return max(self.round_batches, -(-self.workers // max(points, 1)))
+
+    def sample_until(self, grid, state, indices, cap):
+        todo = self.schedule(state, indices, cap)
+        while todo:
+            tasks = []
+            size = self.round_size(len(todo))
+            for i, need in todo.items():
+                for m in batch_sizes(need, self.batch)[:size]:
+                    tasks.append((i, state.batches[i], m))
+                    state.batches[i] += 1
+            results = self.run_tasks(grid, tasks)
+            for (i, _, _), (stats, raw) in zip(tasks, results):
+                state.stats[i].merge(stats)
+                state.raw[i].merge(raw)
+            self.save(grid, [state])
+            todo = self.schedule(state, indices, cap)
+
+    def estimate(self, grid):
+        state, = self.states(grid)
+        self.sample_until(grid, state, range(len(grid)), self.n)
+        self.store(grid, [state])
+        return state
+
+    # successive halving: double the paths of the surviving points until one
+    # is left or all have n, dropping every point whose confidence bound
+    # cannot reach the best lower (upper, for minima) bound
+    def race(self, grid, state, indices):
+        alive = np.asarray(indices)
+        cap = min(self.batch, self.n)
+        while True:
+            self.sample_until(grid, state, alive, cap)
+            means = self.sense * state.means()[alive]
+            half_widths = np.array([state.stats[i].half_width(self.confidence)
+                for i in alive])
+            alive = alive[means+half_widths >= np.max(means-half_widths)]
+            if alive.size == 1 or cap >= self.n:
+                return alive
+            cap = min(2*cap, self.n)
+
+    # coarse-to-fine search over the lattice of grid: race the points of a
+    # coarse sublattice, then the points of each finer sublattice that lie
+    # next to the survivors; labels map grid points to the simulated points
+    def search_grid(self, grid, labels, points, state):
+        if len(grid) == 1:
+            return self.race(points, state, labels)
+        spacing = min(np.min(np.diff(np.unique(xs))) for xs in grid.T
+            if np.unique(xs).size > 1)
+        centre = np.argmin(np.linalg.norm(grid-np.mean(grid, axis=0), axis=-1))
+        idx = np.rint((grid-grid[centre]) / spacing).astype(np.int_)
+        stride = 1
+        coarse = lambda s: np.sum(np.all(idx % s == 0, axis=-1))
+        while coarse(2*stride) >= 2**grid.shape[1]:
+            stride *= 2
+        on_lattice = np.all(idx % stride == 0, axis=-1)
+        alive = self.race(points, state, np.unique(labels[on_lattice]))
+        while stride > 1:
+            stride //= 2
+            tree = cKDTree(idx[np.isin(labels, alive)])
+            distances, _ = tree.query(idx, p=np.inf)
+            on_lattice = np.all(idx % stride == 0, axis=-1)
+            near = on_lattice & (distances <= stride)
+            alive = self.race(points, state, np.unique(labels[near]))
+        return alive
+
+    # with symmetry only one representative per class of equivalent grid
+    # points is simulated
+    def optimise(self, grid):
+        symmetry = None
+        if self.symmetry:
+            symmetry = common_symmetry(self.domains)
+        reps, labels = reduce_grid(grid, self.domains[0].c, symmetry)
+        points = grid[reps]
+        if self.mlmc:
+            mean, self.report = mlmc.optimise(self, points)
+            if symmetry is not None:
+                self.report.append(["Symmetry", f"{symmetry}, {len(grid)} "
+                    f"gridpoints in {len(reps)} classes"])
+            self.report += map(list, self.notes.items())
+            return mean
+        state, = self.states(points)
+        if self.search:
+            finalists = self.search_grid(grid, labels, points, state)
+        else:
+            finalists = np.arange(len(reps))
+            self.sample_until(points, state, finalists, self.n)
+        best = finalists[np.argmax(self.sense*state.means()[finalists])]
+        self.sample_until(points, state, [best], self.n)
+        self.store(points, [state])
+        stats, raw = state.stats[best], state.raw[best]
+        half_width = stats.half_width(self.confidence)
+        counts = np.array([st.count for st in state.stats])
+        self.report = [
+            ["Error", f"±{half_width:.3g} ({self.confidence:.0%} CI)"],
+            ["Samples Used", f"{np.sum(counts)*self.unit} over "
+                f"{np.count_nonzero(counts)} gridpoints"]]
+        if symmetry is not None:
+            self.report.append(["Symmetry",
+                f"{symmetry}, {len(grid)} gridpoints in {len(reps)} classes"])
+        if self.search:
+            self.report.append(["Search", f"{len(finalists)} finalists, "
+                f"{np.count_nonzero(counts)} of {len(reps)} sampled"])
+        if self.antithetic or self.control_variate or self.qmc:
+            var = stats.var * self.unit
+            factor = np.inf
+            if var > 1e-12 * raw.var:
+                factor = raw.var / var
+            self.report.append(["Variance Reduction", f"x{factor:.3g}"])
+        self.report += map(list, self.notes.items())
+        return stats.mean
 
     @abstractmethod
     def run(self):
@@ -96,66 +1049,201 @@ class Simulator(ABC):
 
 
 class ExitTimeSimulator(Simulator):
-    def __init__(self, domain, max_t, dt, dx, n):
-        super().__init__(max_t, dt, dx, n)
+    def __init__(self, domain, max_t, dt, dx, n, **options):
+        super().__init__(max_t, dt, dx, n, **options)
         self.domain = domain
+        self.domains = [domain]
+        self.target = (domain, None)
+        self.fit_memory(domain.dim)
+
+    def select(self, exit_times, occupation_times):
+        return exit_times
+
+    name = "exit-time"
+    sense = 1
 
     def expected_exit_time(self, b0):
-        indicator = self.domain.indicator
-        def sw_f(_):
-            bm = BrownianMotion(b0, self.max_t, self.dt)
-            return bm.get_exit_time(indicator)
-        times = np.vectorize(sw_f)(np.arange(self.n))
-        return np.mean(times)
+        with self.profiled():
+            return self.estimate(np.atleast_2d(b0)).stats[0].mean
 
     def run(self):
-        grid = self.domain.generate_grid(self.dx)
-        times = np.vectorize(self.expected_exit_time)(grid)
-        return np.max(times)
+        with self.profiled():
+            with timing.phase("grid"):
+                grid = self.domain.generate_grid(self.dx)
+            return self.optimise(grid)
 
     max_expected_exit_time = run
 
 
 class OccupationTimeSimulator(Simulator):
-    def __init__(self, domain_d, domain_v, max_t, dt, dx, n):
-        super().__init__(max_t, dt, dx, n)
+    def __init__(self, domain_d, domain_v, max_t, dt, dx, n, **options):
+        super().__init__(max_t, dt, dx, n, **options)
         self.domain_d = domain_d
         self.domain_v = domain_v
+        self.domains = [domain_d, domain_v]
+        self.target = (domain_d, domain_v)
+        self.fit_memory(domain_d.dim)
+
+    def select(self, exit_times, occupation_times):
+        return occupation_times
+
+    name = "occupation-time"
+    sense = -1
 
     def expected_occupation_time(self, b0):
-        indicator_d = self.domain_d.indicator
-        indicator_v = self.domain_v.indicator
-        def sw_f(_):
-            bm = BrownianMotion(b0, self.max_t, self.dt)
-            exit_time = bm.get_exit_time(indicator_d)
-            return bm.get_occupation_time(indicator_v, exit_time)
-        times = np.vectorize(sw_f)(np.arange(self.n))
-        return np.mean(times)
+        with self.profiled():
+            return self.estimate(np.atleast_2d(b0)).stats[0].mean
 
     def run(self):
-        grid = self.domain_v.generate_grid(self.dx)
-        times = np.vectorize(self.expected_occupation_time)(grid)
-        return np.min(times)
+        with self.profiled():
+            with timing.phase("grid"):
+                grid = self.domain_v.generate_grid(self.dx)
+            return self.optimise(grid)
 
     min_expected_occupation_time = run
 
 
-def main(simulator, **kwargs):
-    def domain_parser(domain):
-        name, *para = domain
-        for subclass in Domain.__subclasses__():
-            if name == subclass.__name__:
-                return subclass(*para)
-        raise RuntimeError("invalid domain name")
-    
+# exit times from a family of radial domains about a common centre, such as
+# balls of several radii, all from one set of paths per gridpoint; the grid
+# is the lattice of the outermost domain and each domain's estimate is the
+# maximum over the gridpoints inside it
+class ExitTimeSweepSimulator(Simulator):
+    def __init__(self, domains, max_t, dt, dx, n, **options):
+        super().__init__(max_t, dt, dx, n, **options)
+        if (self.tol is not None or self.control_variate or self.search
+                or self.mlmc or self.bridge or self.engine != "euler"):
+            raise ValueError("a sweep draws n euler paths per gridpoint, "
+                "without tolerance, control variates, search, MLMC or bridge")
+        if (any(domain.sq_bounds is None for domain in domains)
+                or len({tuple(np.ravel(d.c)) for d in domains}) != 1):
+            raise ValueError("a sweep needs radial domains about a common "
+                "centre")
+        self.domains = domains
+        itemsize = np.dtype(self.dtype).itemsize
+        self.fit_memory(domains[0].dim, 2*itemsize + 1)
+
+    name = "exit-time-sweep"
+    sense = 1
+
+    def select(self, exit_times, occupation_times):
+        return exit_times
+
+    # per domain, statistics as Simulator.evaluate's
+    def evaluate(self, b0, m, rng, level=None):
+        exit_idx = self.paths(b0, m, rng).sweep(self.domains)
+        with timing.phase("statistics"):
+            return [(RunningStats.of(self.replicates(times)),
+                RunningStats.of(times)) for times in exit_idx * self.dt]
+
+    # one GridState per domain; a gridpoint's samples only count towards
+    # the domains containing it
+    def estimate(self, grid):
+        states = self.states(grid, len(self.domains))
+        inside = np.array([domain.indicator(grid) for domain in self.domains])
+        counts = np.max([[st.count for st in state.stats]
+            for state in states], axis=0)
+        batches = np.max([state.batches for state in states], axis=0)
+        while np.any(counts < self.n // self.unit):
+            tasks = []
+            left = np.flatnonzero(counts < self.n // self.unit)
+            size = self.round_size(len(left))
+            for i in left:
+                need = (self.n//self.unit - counts[i]) * self.unit
+                for m in batch_sizes(need, self.batch)[:size]:
+                    tasks.append((i, batches[i], m))
+                    batches[i] += 1
+                    counts[i] += m // self.unit
+            results = self.run_tasks(grid, tasks)
+            for (i, _, _), result in zip(tasks, results):
+                for j, (stats, raw) in enumerate(result):
+                    if inside[j, i]:
+                        states[j].stats[i].merge(stats)
+                        states[j].raw[i].merge(raw)
+            for state in states:
+                state.batches[:] = batches
+            self.save(grid, states)
+        self.store(grid, states)
+        return states
+
+    def expected_exit_times(self, b0):
+        with self.profiled():
+            states = self.estimate(np.atleast_2d(b0))
+            return np.array([state.stats[0].mean for state in states])
+
+    # the maximum expected exit time from each of the domains
+    def run(self):
+        with self.profiled():
+            with timing.phase("grid"):
+                outer = max(self.domains, key=lambda d: d.sq_bounds[1])
+                grid = outer.enclosing_ball().generate_grid(self.dx)
+                inside = np.array([domain.indicator(grid)
+                    for domain in self.domains])
+            for domain, mask in zip(self.domains, inside):
+                if not np.any(mask):
+                    raise ValueError(f"{domain} holds no gridpoints")
+            grid = grid[np.any(inside, axis=0)]
+            symmetry = None
+            if self.symmetry:
+                symmetry = common_symmetry(self.domains)
+            reps, _ = reduce_grid(grid, self.domains[0].c, symmetry)
+            points = grid[reps]
+            states = self.estimate(points)
+        results = []
+        self.report = []
+        for domain, state in zip(self.domains, states):
+            means = np.where([st.count > 0 for st in state.stats],
+                state.means(), -np.inf)
+            best = state.stats[np.argmax(means)]
+            results.append(best.mean)
+            self.report.append([str(domain), f"{best.mean:.6g} "
+                f"±{best.half_width(self.confidence):.3g}"])
+        self.report.append(["Samples Used", f"{len(points)*self.n} over "
+            f"{len(points)} gridpoints for {len(self.domains)} domains"])
+        if symmetry is not None:
+            self.report.append(["Symmetry",
+                f"{symmetry}, {len(grid)} gridpoints in {len(reps)} classes"])
+        self.report += map(list, self.notes.items())
+        return np.array(results)
+
+    max_expected_exit_times = run
+
+
+def subclasses(cls):
+    for subclass in cls.__subclasses__():
+        yield subclass
+        yield from subclasses(subclass)
+
+
+# a domain from its name and parameters, such as ["OpenBall", c, r]; the
+# parameters of a composite domain are domains themselves
+def domain_parser(domain):
+    name, *para = domain
+    for subclass in subclasses(Domain):
+        if name == subclass.__name__ and issubclass(subclass, Composite):
+            return subclass(*map(domain_parser, para))
+        if name == subclass.__name__:
+            return subclass(*para)
+    raise RuntimeError("invalid domain name")
+
+
+# the classes running each simulator, which the other oop modes replace by
+# their own
+simulators = {
+    "exit-time": ExitTimeSimulator,
+    "occupation-time": OccupationTimeSimulator,
+    "exit-time-sweep": ExitTimeSweepSimulator,
+}
+
+
+def main(simulator, simulators=simulators, **kwargs):
+    cls = simulators[simulator]
     if simulator == "exit-time":
-        domain = domain_parser(kwargs["domain"])
-        sim = ExitTimeSimulator(domain,
-            kwargs["max_t"], kwargs["dt"], kwargs["dx"], kwargs["n"])
-        return sim.run()
+        sim = cls(domain_parser(kwargs.pop("domain")), **kwargs)
+    elif simulator == "exit-time-sweep":
+        domains = [domain_parser(domain) for domain in kwargs.pop("domains")]
+        sim = cls(domains, **kwargs)
     else: # simulator == "occupation-time"
-        domain_d = domain_parser(kwargs["domain_d"])
-        domain_v = domain_parser(kwargs["domain_v"])
-        sim = OccupationTimeSimulator(domain_d, domain_v,
-            kwargs["max_t"], kwargs["dt"], kwargs["dx"], kwargs["n"])
-        return sim.run()
+        domain_d = domain_parser(kwargs.pop("domain_d"))
+        domain_v = domain_parser(kwargs.pop("domain_v"))
+        sim = cls(domain_d, domain_v, **kwargs)
+    return sim.run(), sim.report
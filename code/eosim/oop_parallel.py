@@ -1,166 +1,88 @@
-from abc import ABC, abstractmethod
+import os
+import time
 
-import numpy as np
 import psutil
 from joblib import Parallel, delayed
 
+from . import oop, timing
+from .oop import (BrownianMotion, BrownianPaths, Domain, OpenBall,
+    OpenAnnulus, Union, Intersection, Difference, Mask, domain_parser)
 
-rng = np.random.default_rng()
-n_cores = psutil.cpu_count(logical=False)
 
+# physical cores, or logical ones where psutil cannot tell, as on some
+# VMs and containers
+n_cores = psutil.cpu_count(logical=False) or os.cpu_count() or 1
 
-class BrownianMotion():
-    def __init__(self, b0, max_t, dt):
-        self.dt = dt
-        num = np.int_(np.rint(max_t/dt))
-        increments = rng.normal(0., np.sqrt(dt), size=(num-1, np.size(b0)))
-        self.bts = np.cumsum(np.insert(increments, 0, b0, axis=0), axis=0)
-
-    def get_exit_time(self, indicator):
-        bool_arr = indicator(self.bts)
-        idx = np.argmin(bool_arr)
-        if idx == 0:
-            raise RuntimeError("exit time is out of reach")
-        return idx * self.dt
 
-    def get_occupation_time(self, indicator, stop_time):
-        bool_arr = indicator(self.bts)
-        idx = np.int_(np.rint(stop_time/self.dt))
-        return np.sum(bool_arr[:idx]) * self.dt
+# deal tasks round-robin so every chunk mixes cheap and expensive points
+def split_tasks(tasks, n_chunks):
+    n_chunks = max(1, min(n_chunks, len(tasks)))
+    return [list(range(j, len(tasks), n_chunks)) for j in range(n_chunks)]
 
 
-class Domain(ABC):
-    @abstractmethod
-    def __str__(self):
-        pass
-
-    @abstractmethod
-    def indicator(self, pts):
-        pass
-
-    @abstractmethod
-    def generate_grid(self, dx):
-        pass
-
-
-class OpenBall(Domain):
-    def __init__(self, c, r):
-        self.dim = np.size(c)
-        self.c = c
-        self.r = r
+# with profiling the worker's phase timings come back with its results
+def run_chunk(sim, grid, tasks):
+    with timing.collect(sim.profile) as counters:
+        with timing.phase("worker"):
+            results = oop.Simulator.run_tasks(sim, grid, tasks)
+    return results, counters
 
-    def __str__(self):
-        return f"{type(self).__name__} ({self.c}, {self.r})"
 
-    def indicator(self, pts):
-        c_distances = np.linalg.norm(pts-self.c, axis=1)
-        return c_distances < self.r
+# start the pool and import this module in its workers, which the first
+# run would otherwise pay for
+def warm_up():
+    Parallel(n_jobs=n_cores)(delayed(split_tasks)([], 1)
+        for _ in range(n_cores))
 
-    def generate_grid(self, dx):
-        xs = np.linspace(-self.r, self.r, np.int_(np.rint(2*self.r/dx))+1)
-        xxs = tuple(xs for _ in range(self.dim))
-        grid = np.array(np.meshgrid(*xxs)).T.reshape(-1, self.dim) + self.c
-        idx = np.nonzero(self.indicator(grid))
-        return grid[idx]
 
+# the loky backend keeps its worker processes alive between calls, so the
+# pool is started once per session and each call ships a few coarse chunks
+class ParallelSimulator():
+    chunks_per_core = 4
 
-class OpenAnnulus(Domain):
-    def __init__(self, c, r1, r2):
-        self.dim = np.size(c)
-        self.c = c
-        self.r1 = r1
-        self.r2 = r2
+    @property
+    def workers(self):
+        return n_cores
 
-    def __str__(self):
-        return f"{type(self).__name__} ({self.c}, {self.r1}, {self.r2})"
+    def run_tasks(self, grid, tasks):
+        chunks = split_tasks(tasks, self.chunks_per_core*n_cores)
+        t0 = time.perf_counter()
+        partials = Parallel(n_jobs=n_cores)(
+            delayed(run_chunk)(self, grid, [tasks[j] for j in chunk])
+            for chunk in chunks)
+        wall = time.perf_counter() - t0
+        results = [None] * len(tasks)
+        for chunk, (partial, counters) in zip(chunks, partials):
+            timing.merge(counters)
+            for j, result in zip(chunk, partial):
+                results[j] = result
+        # the wall time not spent working, with the work spread evenly
+        if timing.enabled:
+            busy = sum(counters.get("worker", (0., 0))[0]
+                for _, counters in partials)
+            idle = wall - busy/min(n_cores, len(chunks))
+            timing.merge({"joblib overhead": (max(idle, 0.), 1)})
+        return results
 
-    def indicator(self, pts):
-        c_distances = np.linalg.norm(pts-self.c, axis=1)
-        return (self.r1<c_distances) & (c_distances<self.r2)
 
-    def generate_grid(self, dx):
-        xs = np.linspace(-self.r2, self.r2, np.int_(np.rint(2*self.r2/dx))+1)
-        xxs = tuple(xs for _ in range(self.dim))
-        grid = np.array(np.meshgrid(*xxs)).T.reshape(-1, self.dim) + self.c
-        idx = np.nonzero(self.indicator(grid))
-        return grid[idx]
+class ExitTimeSimulator(ParallelSimulator, oop.ExitTimeSimulator):
+    pass
 
 
-class Simulator(ABC):
-    def __init__(self, max_t, dt, dx, n):
-        self.max_t = max_t
-        self.dt = dt
-        self.dx = dx
-        self.n = n
+class OccupationTimeSimulator(ParallelSimulator, oop.OccupationTimeSimulator):
+    pass
 
-    @abstractmethod
-    def run(self):
-        pass
 
+class ExitTimeSweepSimulator(ParallelSimulator, oop.ExitTimeSweepSimulator):
+    pass
 
-class ExitTimeSimulator(Simulator):
-    def __init__(self, domain, max_t, dt, dx, n):
-        super().__init__(max_t, dt, dx, n)
-        self.domain = domain
 
-    def expected_exit_time(self, b0):
-        indicator = self.domain.indicator
-        def sw_f():
-            bm = BrownianMotion(b0, self.max_t, self.dt)
-            return bm.get_exit_time(indicator)
-        times = Parallel(n_jobs=n_cores)(
-            delayed(sw_f)() for _ in np.arange(self.n))
-        return np.mean(times)
-
-    def run(self):
-        grid = self.domain.generate_grid(self.dx)
-        times = np.vectorize(self.expected_exit_time)(grid)
-        return np.max(times)
-
-    max_expected_exit_time = run
-
-
-class OccupationTimeSimulator(Simulator):
-    def __init__(self, domain_d, domain_v, max_t, dt, dx, n):
-        super().__init__(max_t, dt, dx, n)
-        self.domain_d = domain_d
-        self.domain_v = domain_v
-
-    def expected_occupation_time(self, b0):
-        indicator_d = self.domain_d.indicator
-        indicator_v = self.domain_v.indicator
-        def sw_f():
-            bm = BrownianMotion(b0, self.max_t, self.dt)
-            exit_time = bm.get_exit_time(indicator_d)
-            return bm.get_occupation_time(indicator_v, exit_time)
-        times = Parallel(n_jobs=n_cores)(
-            delayed(sw_f)() for _ in np.arange(self.n))
-        return np.mean(times)
-
-    def run(self):
-        grid = self.domain_v.generate_grid(self.dx)
-        times = np.vectorize(self.expected_occupation_time)(grid)
-        return np.min(times)
-
-    min_expected_occupation_time = run
+simulators = {
+    "exit-time": ExitTimeSimulator,
+    "occupation-time": OccupationTimeSimulator,
+    "exit-time-sweep": ExitTimeSweepSimulator,
+}
 
 
 def main(simulator, **kwargs):
-    def domain_parser(domain):
-        name, *para = domain
-        for subclass in Domain.__subclasses__():
-            if name == subclass.__name__:
-                return subclass(*para)
-        raise RuntimeError("invalid domain name")
-    
-    if simulator == "exit-time":
-        domain = domain_parser(kwargs["domain"])
-        sim = ExitTimeSimulator(domain,
-            kwargs["max_t"], kwargs["dt"], kwargs["dx"], kwargs["n"])
-        return sim.run()
-    else: # simulator == "occupation-time"
-        domain_d = domain_parser(kwargs["domain_d"])
-        domain_v = domain_parser(kwargs["domain_v"])
-        sim = OccupationTimeSimulator(domain_d, domain_v,
-            kwargs["max_t"], kwargs["dt"], kwargs["dx"], kwargs["n"])
-        return sim.run()
+    return oop.main(simulator, simulators, **kwargs)
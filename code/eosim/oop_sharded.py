@@ -0,0 +1,277 @@
+import argparse
+import atexit
+import os
+import pickle
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+import psutil
+
+from . import oop, timing
+from .oop import (BrownianMotion, BrownianPaths, Domain, OpenBall,
+    OpenAnnulus, Union, Intersection, Difference, Mask, domain_parser)
+from .oop_parallel import run_chunk, split_tasks
+
+
+# directory shared by the coordinator and its workers, possibly over a
+# network file system, the number of workers the coordinator starts on its
+# own machine and the number of shards a round of tasks is split into
+queue = "eosim-queue"
+local_workers = psutil.cpu_count(logical=False) or os.cpu_count() or 1
+n_shards = 64
+# seconds a claimed shard may go without a heartbeat before it is issued
+# again, between heartbeats, and between looks at the queue
+lease = 60.
+heartbeat = 10.
+poll = 0.05
+
+
+# a shard moves from pending to claimed, renamed atomically by the worker
+# that takes it to a name of its own, and its results appear in done; files
+# are written to tmp first so no reader sees half of one
+def folders(path):
+    names = ["tmp", "pending", "claimed", "done"]
+    for name in names:
+        os.makedirs(os.path.join(path, name), exist_ok=True)
+    return [os.path.join(path, name) for name in names]
+
+
+def write(path, folder, name, payload):
+    tmp = os.path.join(path, "tmp", f"{name}.{os.getpid()}")
+    with open(tmp, "wb") as file:
+        pickle.dump(payload, file)
+    os.replace(tmp, os.path.join(path, folder, name))
+
+
+# the simulator, the grid points and the tasks, renumbered to those points,
+# of each shard
+def publish(path, token, sim, grid, shards):
+    folders(path)
+    names = []
+    for j, tasks in enumerate(shards):
+        points = sorted({i for i, *_ in tasks})
+        index = {i: p for p, i in enumerate(points)}
+        local = [(index[i], *rest) for i, *rest in tasks]
+        names.append(f"{token}-{j:05d}")
+        write(path, "pending", names[-1], (sim, grid[points], local))
+    return names
+
+
+# a claim is the shard's name followed by its claimant's
+def shard(claimed):
+    return claimed.rpartition(".")[0]
+
+
+# remove every copy of the shards whose names start with prefix, be they
+# pending, claimed or done
+def discard(path, prefix):
+    for folder in ("pending", "claimed", "done"):
+        for entry in os.scandir(os.path.join(path, folder)):
+            if entry.name.startswith(prefix):
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+
+
+# the results of shard name, or None while it is outstanding
+def take(path, name):
+    try:
+        with open(os.path.join(path, "done", name), "rb") as file:
+            results = pickle.load(file)
+    except FileNotFoundError:
+        return None
+    discard(path, name)
+    return results
+
+
+# move claims without a heartbeat for lease seconds back to pending, as
+# their workers have died; returns how many were issued again
+def reissue(path, lease=lease):
+    _, pending, claimed, _ = folders(path)
+    count = 0
+    for entry in os.scandir(claimed):
+        try:
+            if time.time() - entry.stat().st_mtime > lease:
+                os.rename(entry.path,
+                    os.path.join(pending, shard(entry.name)))
+                count += 1
+        except FileNotFoundError:
+            pass
+    return count
+
+
+# the claim on a shard this process has taken, or None if none is pending;
+# after a reissue the shard's next claimant holds a different claim
+def claim(path):
+    _, pending, claimed, _ = folders(path)
+    for name in sorted(os.listdir(pending)):
+        owned = f"{name}.{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        try:
+            os.rename(os.path.join(pending, name),
+                os.path.join(claimed, owned))
+            os.utime(os.path.join(claimed, owned))
+            return owned
+        except FileNotFoundError:
+            continue
+    return None
+
+
+def beat(file, stop, interval):
+    while not stop.wait(interval):
+        try:
+            os.utime(file)
+        except FileNotFoundError:
+            return
+
+
+# run a claimed shard, touching its claim every interval seconds meanwhile;
+# an error in the simulation is sent back to the coordinator to be raised.
+# A worker whose claim was reissued or taken back meanwhile drops its
+# results, as another worker reports the shard
+def run_shard(path, owned, interval=heartbeat):
+    file = os.path.join(path, "claimed", owned)
+    try:
+        with open(file, "rb") as f:
+            sim, grid, tasks = pickle.load(f)
+    except FileNotFoundError:
+        return
+    stop = threading.Event()
+    threading.Thread(target=beat, args=(file, stop, interval),
+        daemon=True).start()
+    try:
+        payload = (*run_chunk(sim, grid, tasks), None)
+    except Exception as error:
+        payload = (None, {}, error)
+    finally:
+        stop.set()
+    if not os.path.exists(file):
+        return
+    write(path, "done", shard(owned), payload)
+    try:
+        os.remove(file)
+    except FileNotFoundError:
+        pass
+
+
+# claim and run shards until none has been pending for idle seconds, or
+# forever without idle
+def work(path, idle=None, interval=heartbeat):
+    last = time.monotonic()
+    while True:
+        owned = claim(path)
+        if owned is not None:
+            run_shard(path, owned, interval)
+            last = time.monotonic()
+        elif idle is not None and time.monotonic() - last >= idle:
+            return
+        else:
+            time.sleep(poll)
+
+
+# local worker processes, started on first use and stopped at exit
+processes = []
+
+
+def start_worker():
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None,
+        [os.path.dirname(os.path.dirname(__file__)),
+        os.environ.get("PYTHONPATH")])))
+    return subprocess.Popen([sys.executable, "-m", "eosim", "worker", queue,
+        "--heartbeat", str(heartbeat), "--idle", str(max(lease, 60.))],
+        env=env)
+
+
+# start missing local workers and replace dead ones
+def tend():
+    processes[:] = [proc for proc in processes if proc.poll() is None]
+    while len(processes) < local_workers:
+        processes.append(start_worker())
+
+
+@atexit.register
+def stop():
+    for proc in processes:
+        proc.terminate()
+    for proc in processes:
+        proc.wait()
+    processes.clear()
+
+
+# the coordinator publishes each round of tasks as shards to the queue and
+# merges the partial statistics the workers write back; whatever of the
+# round is left in the queue when it ends, by an error or late duplicates,
+# is removed
+class ShardedSimulator():
+    reissued = 0
+
+    @property
+    def workers(self):
+        return max(local_workers, 1)
+
+    def run_tasks(self, grid, tasks):
+        chunks = split_tasks(tasks, n_shards)
+        token = uuid.uuid4().hex
+        names = publish(queue, token, self, grid,
+            [[tasks[j] for j in chunk] for chunk in chunks])
+        left = dict(zip(names, chunks))
+        results = [None] * len(tasks)
+        try:
+            while left:
+                tend()
+                for name in list(left):
+                    partial = take(queue, name)
+                    if partial is None:
+                        continue
+                    partial, counters, error = partial
+                    if error is not None:
+                        raise error
+                    timing.merge(counters)
+                    for j, result in zip(left.pop(name), partial):
+                        results[j] = result
+                if left:
+                    self.reissued += reissue(queue, lease)
+                    time.sleep(poll)
+        finally:
+            discard(queue, token)
+        if self.reissued:
+            self.notes["Reissued"] = (f"{self.reissued} shard(s) of dead "
+                "workers")
+        return results
+
+
+class ExitTimeSimulator(ShardedSimulator, oop.ExitTimeSimulator):
+    pass
+
+
+class OccupationTimeSimulator(ShardedSimulator, oop.OccupationTimeSimulator):
+    pass
+
+
+class ExitTimeSweepSimulator(ShardedSimulator, oop.ExitTimeSweepSimulator):
+    pass
+
+
+simulators = {
+    "exit-time": ExitTimeSimulator,
+    "occupation-time": OccupationTimeSimulator,
+    "exit-time-sweep": ExitTimeSweepSimulator,
+}
+
+
+def main(simulator, **kwargs):
+    return oop.main(simulator, simulators, **kwargs)
+
+
+def worker_main(argv=None):
+    parser = argparse.ArgumentParser(prog="python3 -m eosim worker")
+    parser.add_argument("queue", help="queue directory of the coordinator")
+    parser.add_argument("--idle", type=float,
+        help="exit after this many seconds without work (default: never)")
+    parser.add_argument("--heartbeat", type=float, default=heartbeat,
+        help="seconds between heartbeats on a claimed shard")
+    args = parser.parse_args(argv)
+    work(args.queue, args.idle, args.heartbeat)
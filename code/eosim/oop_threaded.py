@@ -0,0 +1,73 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from . import oop
+from .oop import (BrownianMotion, BrownianPaths, Domain, OpenBall,
+    OpenAnnulus, Union, Intersection, Difference, Mask, domain_parser)
+
+
+n_threads = os.cpu_count() or 1
+local = threading.local()
+pool = None
+
+
+# the pool's threads, and with them their buffers, outlive a call
+def executor():
+    global pool
+    if pool is None or pool.size != n_threads:
+        pool = ThreadPoolExecutor(n_threads)
+        pool.size = n_threads
+    return pool
+
+
+# start the pool's threads, which the first run would otherwise pay for
+def warm_up():
+    list(executor().map(abs, range(n_threads)))
+
+
+# NumPy releases the GIL in the random number generators, cumsum and the
+# comparisons that dominate a batch, so threads sample in parallel without
+# pickling the simulator or its results; each thread keeps its scratch
+# buffers across batches and fills its tasks' slots of the results
+class ThreadedSimulator():
+    threads = True
+
+    @property
+    def workers(self):
+        return n_threads
+
+    def workspace(self):
+        if not hasattr(local, "ws"):
+            local.ws = oop.Workspace()
+        return local.ws
+
+    def run_tasks(self, grid, tasks):
+        results = [None] * len(tasks)
+        def run(j):
+            results[j], = oop.Simulator.run_tasks(self, grid, [tasks[j]])
+        list(executor().map(run, range(len(tasks))))
+        return results
+
+
+class ExitTimeSimulator(ThreadedSimulator, oop.ExitTimeSimulator):
+    pass
+
+
+class OccupationTimeSimulator(ThreadedSimulator, oop.OccupationTimeSimulator):
+    pass
+
+
+class ExitTimeSweepSimulator(ThreadedSimulator, oop.ExitTimeSweepSimulator):
+    pass
+
+
+simulators = {
+    "exit-time": ExitTimeSimulator,
+    "occupation-time": OccupationTimeSimulator,
+    "exit-time-sweep": ExitTimeSweepSimulator,
+}
+
+
+def main(simulator, **kwargs):
+    return oop.main(simulator, simulators, **kwargs)
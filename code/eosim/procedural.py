@@ -1,41 +1,88 @@
 import numpy as np
 
+from . import memory
+
 
 rng = np.random.default_rng()
+batch = 1000
+dtype = float
 
 
 # sampling, exit and occupation times
-def generate_sample(b0, max_t, dt):
+def generate_samples(b0, max_t, dt, n):
     num = np.int_(np.rint(max_t/dt))
-    increments = rng.normal(0., np.sqrt(dt), size=(num-1, np.size(b0)))
-    return np.cumsum(np.insert(increments, 0, b0, axis=0), axis=0)
-
-def get_exit_time(sample, dt, indicator):
-    bool_arr = indicator(sample)
-    idx = np.argmin(bool_arr)
-    if idx == 0:
+    dim = np.size(b0)
+    increments = rng.standard_normal((n, num-1, dim), dtype)
+    increments *= np.sqrt(dt)
+    samples = np.empty((n, num, dim), dtype)
+    samples[:, 0] = b0
+    np.cumsum(increments, axis=1, out=samples[:, 1:])
+    samples[:, 1:] += b0
+    return samples, np.arange(num) * dt
+
+# with the distance to the boundary, a step also exits if its Brownian
+# bridge crosses the boundary, which for points at distances d0 and d1 it
+# does with probability exp(-2*d0*d1/dt)
+def get_exit_idx(samples, indicator, distance=None, dt=None):
+    bool_arr = indicator(samples)
+    if distance is not None:
+        ds = np.maximum(distance(samples), 0)
+        p = np.exp(-2 * ds[:, :-1] * ds[:, 1:] / dt)
+        bool_arr[:, 1:] &= rng.random(p.shape) >= p
+    idx = np.argmin(bool_arr, axis=1)
+    if np.any(idx == 0):
         raise RuntimeError("exit time is out of reach")
-    return idx * dt
+    return idx
+
+def get_occupation_times(samples, dt, indicator, stop_idx):
+    bool_arr = indicator(samples)
+    before = np.arange(bool_arr.shape[1]) < stop_idx[:, np.newaxis]
+    return np.sum(bool_arr & before, axis=1) * dt
 
-def get_occupation_time(sample, dt, indicator, stop_time):
-    bool_arr = indicator(sample)
-    idx = np.int_(np.rint(stop_time/dt))
-    return np.sum(bool_arr[:idx]) * dt
+def batch_sizes(n):
+    return [batch] * (n // batch) + ([n % batch] if n % batch else [])
+
+# a batch holds the increments, samples and offsets from the centre of its
+# paths plus their radii and indicators at every step
+def fit_batch(max_t, dt, dim, budget=None, cap=1000):
+    num = np.int_(np.rint(max_t/dt))
+    itemsize = np.dtype(dtype).itemsize
+    step_bytes = num * ((3*dim+1)*itemsize + 2)
+    size = memory.working_set(budget)
+    if size is None:
+        return cap
+    return memory.fit(size, cap, 1, step_bytes)[0]
 
 
 # domain functions
+def sq_radii(pts, c):
+    offsets = pts - np.asarray(c, dtype=pts.dtype)
+    return np.einsum("...i,...i->...", offsets, offsets)
+
 def indicator_func(domain):
     name, *para = domain
     if name == "OpenBall":
         c, r = para
-        return lambda pts: np.linalg.norm(pts-c, axis=-1) < r
+        return lambda pts: sq_radii(pts, c) < r*r
     else: # name == "OpenAnnulus"
         c, r1, r2 = para
         def ind(pts):
-            c_distances = np.linalg.norm(pts-c, axis=-1)
-            return (r1<c_distances) & (c_distances<r2)
+            sq = sq_radii(pts, c)
+            return (r1*r1<sq) & (sq<r2*r2)
         return ind
 
+def distance_func(domain):
+    name, *para = domain
+    if name == "OpenBall":
+        c, r = para
+        return lambda pts: r - np.sqrt(sq_radii(pts, c))
+    else: # name == "OpenAnnulus"
+        c, r1, r2 = para
+        def dist(pts):
+            radii = np.sqrt(sq_radii(pts, c))
+            return np.minimum(radii-r1, r2-radii)
+        return dist
+
 def generate_grid(domain, dx):
     name, *para = domain
     if name == "OpenBall":
@@ -51,43 +98,59 @@ def generate_grid(domain, dx):
 
 
 # simulator functions
-def simulate_expected_exit_time(indicator, b0, max_t, dt, n):
-    def sw_f(_):
-        sample = generate_sample(b0, max_t, dt)
-        return get_exit_time(sample, dt, indicator)
-    exit_times = np.vectorize(sw_f)(np.arange(n))
+def simulate_expected_exit_time(indicator, b0, max_t, dt, n, distance=None):
+    def bw_f(m):
+        samples, _ = generate_samples(b0, max_t, dt, m)
+        return get_exit_idx(samples, indicator, distance, dt) * dt
+    exit_times = np.concatenate([bw_f(m) for m in batch_sizes(n)])
     return np.mean(exit_times)
 
-def simulate_expected_occupation_time(ind_d, ind_v, b0, max_t, dt, n):
-    def sw_f(_):
-        sample = generate_sample(b0, max_t, dt)
-        exit_time = get_exit_time(sample, dt, ind_d)
-        return get_occupation_time(sample, dt, ind_v, exit_time)
-    occupation_times = np.vectorize(sw_f)(np.arange(n))
+def simulate_expected_occupation_time(ind_d, ind_v, b0, max_t, dt, n,
+        distance=None):
+    def bw_f(m):
+        samples, _ = generate_samples(b0, max_t, dt, m)
+        exit_idx = get_exit_idx(samples, ind_d, distance, dt)
+        return get_occupation_times(samples, dt, ind_v, exit_idx)
+    occupation_times = np.concatenate([bw_f(m) for m in batch_sizes(n)])
     return np.mean(occupation_times)
 
-def simulate_max_expected_exit_time(domain, max_t, dt, dx, n):
+def simulate_max_expected_exit_time(domain, max_t, dt, dx, n, bridge=False):
     indicator = indicator_func(domain)
+    distance = distance_func(domain) if bridge else None
     grid = generate_grid(domain, dx)
-    pw_f = lambda pt: simulate_expected_exit_time(indicator, pt, max_t, dt, n)
-    times = np.vectorize(pw_f)(grid)
+    pw_f = lambda pt: simulate_expected_exit_time(indicator, pt, max_t, dt, n,
+        distance)
+    times = np.vectorize(pw_f, signature="(d)->()")(grid)
     return np.max(times)
 
-def simulate_min_expected_occupation_time(domain_d, domain_v, max_t, dt, dx, n):
+def simulate_min_expected_occupation_time(domain_d, domain_v, max_t, dt, dx, n,
+        bridge=False):
     indicator_d = indicator_func(domain_d)
     indicator_v = indicator_func(domain_v)
+    distance = distance_func(domain_d) if bridge else None
     grid = generate_grid(domain_v, dx)
     pw_f = lambda pt: simulate_expected_occupation_time(
-        indicator_d, indicator_v, pt, max_t, dt, n)
-    times = np.vectorize(pw_f)(grid)
+        indicator_d, indicator_v, pt, max_t, dt, n, distance)
+    times = np.vectorize(pw_f, signature="(d)->()")(grid)
     return np.min(times)
 
 
 def main(simulator, **kwargs):
+    global rng, dtype, batch
+    rng = np.random.default_rng(kwargs.get("seed"))
+    dtype = np.float32 if kwargs.get("float32") else float
+    domain = kwargs.get("domain", kwargs.get("domain_d"))
+    if kwargs.get("max_t") is None:
+        raise ValueError("the procedural mode samples whole paths up to "
+            "max_t, which may only be null in the oop modes")
+    batch = fit_batch(kwargs["max_t"], kwargs["dt"], np.size(domain[1]),
+        kwargs.get("memory"))
     if simulator == "exit-time":
         return simulate_max_expected_exit_time(kwargs["domain"],
-            kwargs["max_t"], kwargs["dt"], kwargs["dx"], kwargs["n"])
+            kwargs["max_t"], kwargs["dt"], kwargs["dx"], kwargs["n"],
+            kwargs.get("bridge", False)), []
     else: # simulator == "occupation-time"
         return simulate_min_expected_occupation_time(
             kwargs["domain_d"], kwargs["domain_v"],
-            kwargs["max_t"], kwargs["dt"], kwargs["dx"], kwargs["n"])
+            kwargs["max_t"], kwargs["dt"], kwargs["dx"], kwargs["n"],
+            kwargs.get("bridge", False)), []
@@ -0,0 +1,43 @@
+import numpy as np
+from scipy.stats import norm
+
+
+# count, mean and sum of squared deviations (M2) of a stream of samples;
+# batches are combined with Chan et al.'s parallel form of Welford's update
+class RunningStats():
+    def __init__(self, count=0, mean=0., m2=0.):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.count}, {self.mean}, {self.m2})"
+
+    @classmethod
+    def of(cls, values):
+        values = np.asarray(values, dtype=float)
+        if values.size == 0:
+            return cls()
+        mean = np.mean(values)
+        return cls(values.size, mean, np.sum((values-mean)**2))
+
+    def merge(self, other):
+        count = self.count + other.count
+        if count == 0:
+            return self
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta**2 * self.count * other.count / count
+        self.count = count
+        return self
+
+    def update(self, values):
+        return self.merge(RunningStats.of(values))
+
+    @property
+    def var(self):
+        return self.m2 / (self.count-1) if self.count > 1 else np.inf
+
+    def half_width(self, confidence=0.95):
+        z = norm.ppf(0.5 + confidence/2)
+        return z * np.sqrt(self.var/self.count) if self.count else np.inf
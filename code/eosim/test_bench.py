@@ -0,0 +1,64 @@
+import unittest
+
+from . import bench, oop_threaded
+
+
+class TestBench(unittest.TestCase):
+    case = dict(mode="oop", simulator="occupation-time", n=100, dt=0.05,
+        dx=1., dim=2, workers=1, max_t=None)
+
+    def test_run_case(self):
+        result = bench.run_case(self.case, {"seed": 0})
+        self.assertEqual(result["gridpoints"], 1)
+        self.assertGreater(result["paths_per_sec"], 0)
+        self.assertGreater(result["peak_rss_mib"], 0)
+
+    def test_samples_used(self):
+        case = dict(self.case, simulator="exit-time", dx=0.5)
+        result = bench.run_case(case, {"seed": 0, "symmetry": True})
+        self.assertEqual(result["gridpoints"], 9)
+        # one gridpoint at each of the distances 0, 0.5 and 0.71 from the
+        # centre
+        paths = result["paths_per_sec"] * result["seconds"]
+        self.assertAlmostEqual(paths, 3 * case["n"])
+        self.assertEqual(bench.paths_used([], 7), 7)
+
+    # every path of the default cases exits before the default max_t
+    def test_defaults(self):
+        for mode in ("procedural", "oop"):
+            for simulator in bench.simulators:
+                case = dict(self.case, mode=mode, simulator=simulator,
+                    n=1000, dt=1e-2, max_t=bench.max_t)
+                result = bench.run_case(case, {"seed": 0})
+                self.assertGreater(result["result"], 0)
+
+    def test_warm_up(self):
+        case = dict(self.case, mode="oop-threaded", workers=2)
+        saved = oop_threaded.n_threads
+        try:
+            result = bench.run_case(case, {"seed": 0})
+            # the pool was started before the run was timed
+            self.assertEqual(oop_threaded.pool.size, 2)
+        finally:
+            oop_threaded.n_threads = saved
+        self.assertGreater(result["startup_seconds"], 0)
+
+    def test_failed_case(self):
+        case = dict(self.case, mode="procedural", max_t=0.1)
+        result = bench.run_isolated(case, {"seed": 0})
+        self.assertIn("exit time is out of reach", result["error"])
+        bench.efficiencies([result])
+        self.assertIsNone(result["efficiency"])
+
+    def test_efficiencies(self):
+        results = [dict(self.case, mode="oop-parallel", workers=w, seconds=s)
+            for w, s in ((1, 4.), (4, 2.))] + [dict(self.case, seconds=1.)]
+        results.append(dict(self.case, mode="oop-threaded", workers=2,
+            seconds=1.))
+        bench.efficiencies(results)
+        self.assertEqual([r["efficiency"] for r in results],
+            [1., 0.5, None, None])
+
+
+if __name__ == "__main__":
+    unittest.main()
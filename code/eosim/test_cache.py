@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from . import oop
+from .cache import Cache
+
+
+class TestCache(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_get_put(self):
+        cache = Cache(self.dir.name)
+        self.assertIsNone(cache.get("sig", [0., 1.]))
+        cache.put("sig", [0., 1.], np.ones((1, 7)))
+        np.testing.assert_array_equal(cache.get("sig", [0., 1.]),
+            np.ones((1, 7)))
+        self.assertIsNone(cache.get("other", [0., 1.]))
+        self.assertIsNone(cache.get("sig", [0., 0.]))
+
+    def test_evict(self):
+        cache = Cache(self.dir.name, size=0)
+        for j in range(3):
+            cache.put("sig", [float(j)], np.ones((1, 7)))
+            os.utime(cache.file("sig", [float(j)]), (j, j))
+        entry = os.path.getsize(cache.file("sig", [0.]))
+        cache.size = 2.5 * entry / 2**20
+        cache.get("sig", [0.])
+        cache.evict()
+        self.assertIsNone(cache.get("sig", [1.]))
+        self.assertIsNotNone(cache.get("sig", [0.]))
+        self.assertIsNotNone(cache.get("sig", [2.]))
+
+
+class TestSimulator(unittest.TestCase):
+    ob2d = oop.OpenBall(np.zeros(2), 1)
+    args = (ob2d, None, 0.05, 0.5)
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_reuse(self):
+        options = dict(batch=100, seed=0, cache=self.dir.name)
+        first = oop.ExitTimeSimulator(*self.args, 200, **options)
+        again = oop.ExitTimeSimulator(*self.args, 200, **options)
+        self.assertEqual(first.run(), again.run())
+        grid = self.ob2d.generate_grid(0.5)
+        self.assertEqual(dict(map(tuple, again.report))["Cache"],
+            f"{len(grid)} of {len(grid)} gridpoints reused")
+        more = oop.ExitTimeSimulator(*self.args, 400, **options)
+        full = oop.ExitTimeSimulator(*self.args, 400, batch=100, seed=0)
+        self.assertEqual(more.run(), full.run())
+
+    def test_seed(self):
+        oop.ExitTimeSimulator(*self.args, 200, seed=0,
+            cache=self.dir.name).run()
+        other = oop.ExitTimeSimulator(*self.args, 200, seed=1,
+            cache=self.dir.name)
+        other.run()
+        self.assertTrue(dict(map(tuple, other.report))["Cache"].startswith(
+            "0 of"))
+
+
+if __name__ == "__main__":
+    unittest.main()
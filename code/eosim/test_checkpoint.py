@@ -0,0 +1,106 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from . import checkpoint
+from . import oop
+
+
+class Interrupted(Exception):
+    pass
+
+
+# stops with an exception once the given number of rounds have run
+class InterruptedSimulator(oop.ExitTimeSimulator):
+    rounds = 1
+
+    def run_tasks(self, grid, tasks):
+        if self.rounds == 0:
+            raise Interrupted
+        self.rounds -= 1
+        return super().run_tasks(grid, tasks)
+
+
+class TestCheckpoint(unittest.TestCase):
+    ob2d = oop.OpenBall(np.zeros(2), 1)
+    args = (ob2d, None, 0.05, 0.5)
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "run.npz")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_round_trip(self):
+        state = oop.GridState(2)
+        state.stats[1].update([1., 2., 4.])
+        state.batches[1] = 3
+        points = np.array([[0., 0.], [0.5, 0.]])
+        checkpoint.save(self.path, "sig", points, [state])
+        loaded, = checkpoint.load(self.path, "sig", points[::-1])
+        self.assertEqual(loaded.stats[0].count, 3)
+        self.assertAlmostEqual(loaded.stats[0].m2, state.stats[1].m2)
+        self.assertEqual(loaded.batches[0], 3)
+        self.assertEqual(loaded.stats[1].count, 0)
+        with self.assertRaises(ValueError):
+            checkpoint.load(self.path, "other", points)
+
+    def test_resume(self):
+        options = dict(batch=100, seed=0, tol=0.01)
+        full = oop.ExitTimeSimulator(*self.args, 400, **options)
+        sim = InterruptedSimulator(*self.args, 400, checkpoint=self.path,
+            **options)
+        with self.assertRaises(Interrupted):
+            sim.run()
+        resumed = oop.ExitTimeSimulator(*self.args, 400,
+            checkpoint=self.path, **options)
+        self.assertEqual(resumed.run(), full.run())
+
+    def test_resume_fixed_n(self):
+        full = oop.ExitTimeSimulator(*self.args, 1000, batch=100, seed=0)
+        sim = InterruptedSimulator(*self.args, 1000, batch=100, seed=0,
+            checkpoint=self.path)
+        with self.assertRaises(Interrupted):
+            sim.run()
+        resumed, = checkpoint.load(self.path, sim.signature(),
+            self.ob2d.generate_grid(sim.dx))
+        counts = [st.count for st in resumed.stats]
+        self.assertTrue(all(count == 4 * 100 for count in counts))
+        resumed = oop.ExitTimeSimulator(*self.args, 1000, batch=100, seed=0,
+            checkpoint=self.path)
+        self.assertEqual(resumed.run(), full.run())
+
+    # without a checkpoint all batches go out together, and with one a
+    # round still holds a task for every worker
+    def test_rounds(self):
+        sim = InterruptedSimulator(self.ob2d, None, 0.05, 1., 1000,
+            batch=100, seed=0)
+        sim.run()
+        self.assertEqual(sim.rounds, 0)
+        sim = InterruptedSimulator(self.ob2d, None, 0.05, 1., 1000,
+            batch=100, seed=0, checkpoint=self.path)
+        sim.workers, sim.rounds = 8, 2
+        sim.run()
+        self.assertEqual(sim.rounds, 0)
+
+    def test_extend(self):
+        oop.ExitTimeSimulator(*self.args, 200, batch=100, seed=0,
+            checkpoint=self.path).run()
+        more = oop.ExitTimeSimulator(*self.args, 400, batch=100, seed=0,
+            checkpoint=self.path)
+        full = oop.ExitTimeSimulator(*self.args, 400, batch=100, seed=0)
+        self.assertEqual(more.run(), full.run())
+
+    def test_signature(self):
+        oop.ExitTimeSimulator(*self.args, 200, seed=0,
+            checkpoint=self.path).run()
+        with self.assertRaises(ValueError):
+            oop.ExitTimeSimulator(*self.args, 200, seed=1,
+                checkpoint=self.path).run()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+
+import numpy as np
+import psutil
+
+from . import memory
+from . import oop
+
+
+class TestFit(unittest.TestCase):
+    def test_chunk_first(self):
+        self.assertEqual(memory.fit(10**9, 1000, 32, 40), (1000, 32))
+        self.assertEqual(memory.fit(40*1000*8, 1000, 32, 40), (1000, 8))
+        self.assertEqual(memory.fit(40*100, 1000, 32, 40), (100, 1))
+
+    def test_path_bytes(self):
+        self.assertEqual(memory.fit(1000*(8*40+100), 1000, 32, 40, 100),
+            (1000, 8))
+
+    def test_budget_below_footprint(self):
+        with self.assertRaises(ValueError):
+            memory.working_set(1)
+
+    def test_no_budget(self):
+        self.assertIsNone(memory.working_set(workers=10**9))
+        ob = oop.OpenBall(np.zeros(2), 1)
+        sim = oop.ExitTimeSimulator(ob, None, 0.01, 1., 200, batch=100)
+        sim.workers = 10**9
+        sim.fit_memory(2)
+        self.assertEqual((sim.batch, sim.chunk), (100, 32))
+
+
+class TestSimulator(unittest.TestCase):
+    ob2d = oop.OpenBall(np.zeros(2), 1)
+
+    def test_fit_memory(self):
+        rss = psutil.Process().memory_info().rss / 2**20
+        sim = oop.ExitTimeSimulator(self.ob2d, None, 0.01, 1., 200, batch=100,
+            chunk=10**6, memory=rss+1)
+        self.assertLess(sim.chunk, 10**6)
+        sim.run()
+        self.assertIn("Memory", dict(map(tuple, sim.report)))
+
+    def test_float32(self):
+        args = (self.ob2d, None, 0.01, 1., 2000)
+        sim = oop.ExitTimeSimulator(*args, seed=0, float32=True)
+        paths = sim.paths(np.zeros(2), 10, np.random.default_rng(0))
+        self.assertEqual(paths.increments(np.arange(10), 4).dtype, np.float32)
+        plain = oop.ExitTimeSimulator(*args, seed=0)
+        self.assertAlmostEqual(sim.run(), plain.run(), delta=0.03)
+
+
+if __name__ == "__main__":
+    unittest.main()
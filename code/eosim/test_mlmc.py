@@ -0,0 +1,62 @@
+import unittest
+
+import numpy as np
+
+from . import mlmc
+from . import oop
+
+
+class TestCoupledWalk(unittest.TestCase):
+    ob2d = oop.OpenBall(np.zeros(2), 1)
+    ob2d_v = oop.OpenBall(np.zeros(2), 0.5)
+
+    def test_levels_agree(self):
+        rng = np.random.default_rng(0)
+        fine, coarse = mlmc.coupled_walk(np.zeros(2), 2000, None, 1e-3, 32,
+            rng, self.ob2d, self.ob2d_v)
+        for f, c in zip(fine, coarse):
+            self.assertAlmostEqual(np.mean(f), np.mean(c), delta=0.02)
+            self.assertLess(np.std(f-c), 0.3*np.std(f))
+        self.assertAlmostEqual(np.mean(fine[0]), 0.5, delta=0.03)
+
+    def test_time_cap(self):
+        rng = np.random.default_rng(0)
+        with self.assertRaises(RuntimeError):
+            mlmc.coupled_walk(np.zeros(2), 10, 0.01, 1e-3, 32, rng, self.ob2d)
+
+
+class TestMLMC(unittest.TestCase):
+    ob2d = oop.OpenBall(np.zeros(2), 1)
+
+    def test_exit_time(self):
+        sim = oop.ExitTimeSimulator(self.ob2d, None, 2e-3, 1., 1000, seed=0,
+            tol=0.01, mlmc=True, levels=3)
+        self.assertAlmostEqual(sim.run(), 0.5, delta=0.05)
+        rows = dict(sim.report)
+        self.assertIn("3 levels", rows["MLMC"])
+        self.assertIn("Cost Saving", rows)
+
+    def test_reproducible(self):
+        results = [oop.ExitTimeSimulator(self.ob2d, None, 1e-2, 1., 1000,
+            seed=0, tol=0.02, mlmc=True).run() for _ in range(2)]
+        self.assertEqual(results[0], results[1])
+
+    # n caps the samples over all levels however small tol is
+    def test_cap(self):
+        sim = oop.ExitTimeSimulator(self.ob2d, None, 1e-2, 1., 50, seed=0,
+            tol=1e-3, mlmc=True)
+        sim.run()
+        used = int(dict(sim.report)["Samples Used"].split()[0])
+        self.assertLessEqual(used, 50)
+        self.assertGreater(used, 40)
+        with self.assertRaises(ValueError):
+            oop.ExitTimeSimulator(self.ob2d, None, 1e-2, 1., 6, tol=1e-3,
+                mlmc=True)
+
+    def test_needs_tolerance(self):
+        with self.assertRaises(ValueError):
+            oop.ExitTimeSimulator(self.ob2d, None, 1e-2, 1., 1000, mlmc=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
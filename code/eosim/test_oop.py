@@ -24,6 +24,85 @@ class TestBrownianMotion(unittest.TestCase):
         ...
 
 
+class TestBrownianPaths(unittest.TestCase):
+    ob1d = oop.OpenBall(np.zeros(1), 1)
+    ob2d = oop.OpenBall(np.zeros(2), 1)
+
+    def test_get_exit_times(self):
+        bps = oop.BrownianPaths(np.zeros(2), 50, 100, 0.1, chunk=3)
+        times = bps.get_exit_times(self.ob2d)
+        self.assertEqual(times.shape, (50,))
+        self.assertTrue(np.all(times > 0))
+        np.testing.assert_allclose(times/0.1, np.rint(times/0.1))
+
+    def test_out_of_reach(self):
+        bps = oop.BrownianPaths(np.zeros(1), 5, 1, 0.1)
+        with self.assertRaises(RuntimeError):
+            bps.get_exit_times(oop.OpenBall(np.zeros(1), 1e9))
+        with self.assertRaises(RuntimeError):
+            bps.get_exit_times(oop.OpenBall(np.full(1, 5.), 1))
+
+    def test_unbounded_time(self):
+        bps = oop.BrownianPaths(np.zeros(1), 2000, None, 1e-2)
+        times = bps.get_exit_times(self.ob1d)
+        self.assertAlmostEqual(np.mean(times), 1., delta=0.2)
+
+    def test_get_occupation_times(self):
+        bps = oop.BrownianPaths(np.zeros(2), 50, None, 0.1, chunk=3)
+        inner = oop.OpenBall(np.zeros(2), 0.5)
+        times = bps.get_occupation_times(self.ob2d, inner)
+        self.assertTrue(np.all(times >= 0.1))
+        exit_idx, counts = bps.walk([self.ob2d], self.ob2d)
+        np.testing.assert_array_equal(exit_idx[0], counts)
+
+    def test_walk_several_domains(self):
+        bps = oop.BrownianPaths(np.zeros(2), 50, None, 0.1, chunk=3)
+        inner = oop.OpenBall(np.zeros(2), 0.5)
+        exit_idx, _ = bps.walk([inner, self.ob2d])
+        self.assertTrue(np.all(exit_idx[0] <= exit_idx[1]))
+
+    def test_sweep(self):
+        inner = oop.OpenBall(np.zeros(2), 0.5)
+        hole = oop.OpenAnnulus(np.zeros(2), 0.5, 0.9)
+        ring = oop.OpenAnnulus(np.zeros(2), 0.1, 0.9)
+        b0 = np.array([0.3, 0.])
+        walked, _ = oop.BrownianPaths(b0, 50, None, 0.1, chunk=3,
+            rng=np.random.default_rng(0)).walk([inner, ring, self.ob2d])
+        swept = oop.BrownianPaths(b0, 50, None, 0.1, chunk=3,
+            rng=np.random.default_rng(0)).sweep([inner, hole, ring,
+            self.ob2d])
+        np.testing.assert_array_equal(swept[[0, 2, 3]], walked)
+        np.testing.assert_array_equal(swept[1], 0)
+
+    def test_antithetic(self):
+        bps = oop.BrownianPaths(np.zeros(1), 50, None, 0.1, antithetic=True)
+        exit_idx = bps.get_exit_idx(self.ob1d)
+        np.testing.assert_array_equal(exit_idx[:25], exit_idx[25:])
+        with self.assertRaises(ValueError):
+            oop.BrownianPaths(np.zeros(1), 5, None, 0.1, antithetic=True)
+
+    def test_bridge_order(self):
+        order = oop.bridge_order(6)
+        self.assertEqual(sorted(idx for idx, _, _ in order), list(range(1, 7)))
+        known = {0}
+        for idx, left, right in order[1:]:
+            known.add(order[0][0])
+            self.assertTrue(left in known and right in known)
+            self.assertLess(left, idx)
+            self.assertLess(idx, right)
+            known.add(idx)
+
+    def test_qmc(self):
+        rng = np.random.default_rng(0)
+        zs = oop.sobol_increments(4096, 16, 2, 0.1, rng)
+        self.assertEqual(zs.shape, (4096, 16, 2))
+        self.assertAlmostEqual(np.mean(zs), 0., delta=1e-3)
+        np.testing.assert_allclose(np.var(zs, axis=(0, 2)), 0.1, rtol=0.05)
+        bps = oop.BrownianPaths(np.zeros(1), 64, None, 0.1, qmc=True)
+        self.assertEqual(bps.sobol.shape, (64, bps.qmc_steps, 1))
+        self.assertTrue(np.all(bps.get_exit_times(self.ob1d) > 0))
+
+
 class TestOpenBall(unittest.TestCase):
     ob1d = oop.OpenBall(np.ones(1), 1)
     ob1d = oop.OpenBall(np.ones(2), 1)
@@ -35,6 +114,54 @@ class TestOpenBall(unittest.TestCase):
         ...
 
 
+class TestReduceGrid(unittest.TestCase):
+    ob3d = oop.OpenBall(np.zeros(3), 1)
+
+    def test_hyperoctahedral(self):
+        grid = self.ob3d.generate_grid(0.25)
+        reps, labels = oop.reduce_grid(grid, self.ob3d.c, "hyperoctahedral")
+        self.assertEqual(len(labels), len(grid))
+        self.assertLess(len(reps) * 10, len(grid))
+        keys = np.sort(np.abs(grid), axis=-1)
+        np.testing.assert_allclose(keys, keys[reps][labels])
+
+    def test_rotation(self):
+        grid = self.ob3d.generate_grid(0.25)
+        reps, labels = oop.reduce_grid(grid, self.ob3d.c, "rotation")
+        radii = np.linalg.norm(grid, axis=-1)
+        np.testing.assert_allclose(radii, radii[reps][labels])
+        self.assertEqual(len(reps), len(np.unique(np.round(radii, 9))))
+
+    def test_common_symmetry(self):
+        ob = oop.OpenBall(np.ones(2), 1)
+        oa = oop.OpenAnnulus(np.ones(2), 0.5, 1)
+        self.assertEqual(oop.common_symmetry([ob, oa]), "rotation")
+        shifted = oop.OpenBall(np.zeros(2), 1)
+        self.assertIsNone(oop.common_symmetry([ob, shifted]))
+
+
+class TestFusedIndicators(unittest.TestCase):
+    pts = np.random.default_rng(0).normal(size=(4, 6, 2))
+
+    def test_within(self):
+        ws = oop.Workspace()
+        sq = oop.sq_radii(self.pts, np.ones(2), ws)
+        np.testing.assert_allclose(sq, np.sum((self.pts-1)**2, axis=-1))
+        inside = oop.within(sq, (0.5, 1.5), ws)
+        np.testing.assert_array_equal(inside, (0.5 < sq) & (sq < 1.5))
+        self.assertIs(oop.within(sq, (0., 1.), ws).base, inside.base)
+
+    def test_fused_indicators(self):
+        ob = oop.OpenBall(np.zeros(2), 1)
+        for domain_v in (oop.OpenAnnulus(np.zeros(2), 0.5, 1),
+                oop.OpenBall(np.ones(2), 1)):
+            inside_d, inside_v = oop.fused_indicators(ob, domain_v, self.pts,
+                oop.Workspace())
+            np.testing.assert_array_equal(inside_d, ob.indicator(self.pts))
+            np.testing.assert_array_equal(inside_v,
+                domain_v.indicator(self.pts))
+
+
 class TestOpenAnnulus(unittest.TestCase):
     def test_indicator(self):
         ...
@@ -43,12 +170,170 @@ class TestOpenAnnulus(unittest.TestCase):
         ...
 
 
+class TestVoxelDomain(unittest.TestCase):
+    ob = oop.OpenBall(np.zeros(2), 1)
+    hole = oop.OpenBall(np.zeros(2), 0.3)
+
+    def test_indicator(self):
+        lobes = oop.Union(self.ob, oop.OpenBall(np.array([1., 0.]), 0.7))
+        pts = np.random.default_rng(0).uniform(-1.5, 2, (10000, 2))
+        for domain in (lobes, oop.Intersection(self.ob, lobes),
+                oop.Difference(lobes, self.hole)):
+            np.testing.assert_array_equal(domain.indicator(pts),
+                domain.exact(pts))
+        self.assertEqual(lobes.shape, (128, 95))
+
+    def test_mask(self):
+        mask = np.zeros((20, 20), dtype=bool)
+        mask[5:15, 5:15] = True
+        square = oop.Mask([-1, -1], 0.1, mask)
+        pts = np.array([[0., 0.], [-0.45, 0.], [-0.55, 0.], [0., 1.5]])
+        np.testing.assert_array_equal(square.indicator(pts),
+            [True, True, False, False])
+        both = oop.Intersection(self.ob, square)
+        np.testing.assert_array_equal(both.indicator(pts),
+            square.indicator(pts))
+
+    def test_domain_parser(self):
+        domain = oop.domain_parser(["Difference", ["OpenBall", [0, 0], 1],
+            ["OpenBall", [0, 0], 0.3]])
+        self.assertIsInstance(domain, oop.Difference)
+        self.assertIsInstance(domain.domains[1], oop.OpenBall)
+        annulus = oop.OpenAnnulus(np.zeros(2), 0.3, 1)
+        args = (None, 0.01, 0.25, 100)
+        self.assertEqual(oop.ExitTimeSimulator(domain, *args, seed=0).run(),
+            oop.ExitTimeSimulator(annulus, *args, seed=0).run())
+
+
+class TestStream(unittest.TestCase):
+    def test_reproducible(self):
+        pt = np.array([0.5, 0.])
+        x = oop.stream(1, pt, 0).normal(size=4)
+        np.testing.assert_array_equal(x, oop.stream(1, pt, 0).normal(size=4))
+        for y in (oop.stream(2, pt, 0), oop.stream(1, pt, 1),
+                oop.stream(1, -pt, 0), oop.stream(None, pt, 0)):
+            self.assertFalse(np.array_equal(x, y.normal(size=4)))
+
+
 class TestExitTimeSimulator(unittest.TestCase):
-    ...
+    ob2d = oop.OpenBall(np.zeros(2), 1)
+
+    def test_seed(self):
+        sims = [oop.ExitTimeSimulator(self.ob2d, 10, 0.1, 0.5, 30,
+            batch=10, seed=seed) for seed in (7, 7, 8)]
+        results = [sim.run() for sim in sims]
+        self.assertEqual(results[0], results[1])
+        self.assertNotEqual(results[0], results[2])
+
+    def test_tolerance(self):
+        sim = oop.ExitTimeSimulator(self.ob2d, 10, 0.1, 0.5, 5000,
+            batch=100, seed=0, tol=0.05)
+        stats = sim.estimate(self.ob2d.generate_grid(sim.dx)).stats
+        for st in stats:
+            self.assertTrue(st.half_width() <= 0.05 or st.count == 5000)
+            self.assertLess(st.count, 5000)
+
+
+    def test_search(self):
+        args = (self.ob2d, None, 0.05, 0.125, 400)
+        sim = oop.ExitTimeSimulator(*args, batch=50, seed=0, search=True)
+        full = oop.ExitTimeSimulator(*args, batch=50, seed=0)
+        self.assertAlmostEqual(sim.run(), full.run(), delta=0.05)
+        report = dict(map(tuple, sim.report))
+        sampled = int(report["Search"].split()[2])
+        self.assertLess(sampled, len(self.ob2d.generate_grid(0.125)))
+
+    def test_bridge(self):
+        b0 = np.array([0.6, 0.])
+        exact = self.ob2d.expected_exit_time(b0)
+        args = (self.ob2d, None, 0.05, 1., 10000)
+        plain = oop.ExitTimeSimulator(*args, seed=0)
+        bridged = oop.ExitTimeSimulator(*args, seed=0, bridge=True)
+        self.assertGreater(plain.expected_exit_time(b0) - exact, 0.05)
+        self.assertAlmostEqual(bridged.expected_exit_time(b0), exact,
+            delta=0.03)
+        rng = np.random.default_rng(0)
+        self.assertFalse(np.any(oop.crossed(np.ones(100), 1., 0.01, rng)))
+        self.assertTrue(np.all(oop.crossed(np.zeros(100), 1., 0.01, rng)))
+
+    def test_qmc(self):
+        args = (self.ob2d, 10, 0.1, 1., 1024)
+        sim = oop.ExitTimeSimulator(*args, batch=128, seed=0, qmc=True)
+        plain = oop.ExitTimeSimulator(*args, seed=0)
+        self.assertAlmostEqual(sim.run(), plain.run(), delta=0.05)
+        report = dict(map(tuple, sim.report))
+        self.assertEqual(report["Samples Used"], "1024 over 1 gridpoints")
+        self.assertIn("Variance Reduction", report)
+        with self.assertRaises(ValueError):
+            oop.ExitTimeSimulator(self.ob2d, 10, 0.1, 1., 1024, qmc=True,
+                antithetic=True)
+
+    def test_qmc_replicates(self):
+        args = (self.ob2d, 10, 0.1, 1.)
+        sim = oop.ExitTimeSimulator(*args, 100, seed=0, qmc=True, tol=0.01)
+        self.assertEqual(sim.batch, 32)
+        self.assertGreater(sim.run(), 0)
+        report = dict(map(tuple, sim.report))
+        self.assertEqual(report["Samples Used"], "96 over 1 gridpoints")
+        self.assertEqual(oop.ExitTimeSimulator(*args, 4096, batch=1000,
+            qmc=True).batch, 512)
+        with self.assertRaises(ValueError):
+            oop.ExitTimeSimulator(*args, 3, qmc=True)
+
+    def test_control_variate(self):
+        sim = oop.ExitTimeSimulator(self.ob2d, 10, 0.1, 0.5, 100,
+            control_variate=True, bridge=True)
+        b0 = np.array([0.5, 0.])
+        self.assertAlmostEqual(sim.expected_exit_time(b0),
+            self.ob2d.expected_exit_time(b0))
+        with self.assertRaises(ValueError):
+            oop.ExitTimeSimulator(self.ob2d, 10, 0.1, 0.5, 100,
+                control_variate=True)
+
+    def test_variance_reduction(self):
+        oa = oop.OpenAnnulus(np.zeros(2), 0.2, 1)
+        sim = oop.ExitTimeSimulator(oa, None, 0.01, 0.5, 2000, seed=0,
+            control_variate=True, bridge=True)
+        sim.run()
+        report = dict(map(tuple, sim.report))
+        self.assertGreater(float(report["Variance Reduction"][1:]), 1)
+
+
+class TestExitTimeSweepSimulator(unittest.TestCase):
+    balls = [oop.OpenBall(np.zeros(2), r) for r in (0.5, 1, 1.5)]
+
+    def test_run(self):
+        args = (None, 0.05, 0.25, 200)
+        sim = oop.ExitTimeSweepSimulator(self.balls, *args, seed=0)
+        results = sim.run()
+        self.assertEqual(len(results), 3)
+        self.assertTrue(np.all(np.diff(results) > 0))
+        outer = oop.ExitTimeSimulator(self.balls[-1], *args, seed=0)
+        self.assertEqual(results[-1], outer.run())
+        report = dict(map(tuple, sim.report))
+        self.assertEqual(len(report), 4)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            oop.ExitTimeSweepSimulator(self.balls, 10, 0.1, 0.5, 100,
+                tol=0.1)
+        with self.assertRaises(ValueError):
+            oop.ExitTimeSweepSimulator([self.balls[0],
+                oop.OpenBall(np.ones(2), 1)], 10, 0.1, 0.5, 100)
 
 
 class TestOccupationTimeSimulator(unittest.TestCase):
-    ...
+    def test_control_variate(self):
+        ob = oop.OpenBall(np.zeros(2), 1)
+        inner = oop.OpenBall(np.zeros(2), 0.5)
+        sim = oop.OccupationTimeSimulator(ob, inner, None, 0.01, 0.5, 2000,
+            seed=0, control_variate=True, bridge=True)
+        plain = oop.OccupationTimeSimulator(ob, inner, None, 0.01, 0.5,
+            2000, seed=0, bridge=True)
+        b0 = np.zeros(2)
+        stats = sim.estimate([b0]).stats
+        plain_stats = plain.estimate([b0]).stats
+        self.assertLess(stats[0].var, plain_stats[0].var)
 
 
 if __name__ == "__main__":
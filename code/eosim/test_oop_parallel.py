@@ -0,0 +1,50 @@
+import unittest
+
+import numpy as np
+
+from . import oop_parallel as par
+
+
+class TestSplitTasks(unittest.TestCase):
+    def test_split_tasks(self):
+        chunks = par.split_tasks(list(range(10)), 4)
+        self.assertEqual(len(chunks), 4)
+        self.assertCountEqual(sum(chunks, []), range(10))
+        self.assertEqual(len(par.split_tasks(list(range(2)), 4)), 2)
+
+
+class TestExitTimeSimulator(unittest.TestCase):
+    def test_run_tasks(self):
+        ob = par.OpenBall(np.zeros(2), 1)
+        sim = par.ExitTimeSimulator(ob, 10, 0.1, 0.5, 30, batch=10)
+        grid = ob.generate_grid(sim.dx)
+        stats = sim.estimate(grid).stats
+        self.assertEqual(len(stats), len(grid))
+        self.assertTrue(all(st.count == 30 and st.mean > 0 for st in stats))
+
+    def test_seed(self):
+        ob = par.OpenBall(np.zeros(2), 1)
+        args = (ob, 10, 0.1, 0.5, 30)
+        serial = par.oop.ExitTimeSimulator(*args, batch=10, seed=3)
+        parallel = par.ExitTimeSimulator(*args, batch=10, seed=3)
+        self.assertEqual(serial.run(), parallel.run())
+
+    def test_sweep(self):
+        balls = [par.OpenBall(np.zeros(2), r) for r in (0.5, 1)]
+        args = (balls, 10, 0.1, 0.5, 30)
+        serial = par.oop.ExitTimeSweepSimulator(*args, batch=10, seed=3)
+        parallel = par.ExitTimeSweepSimulator(*args, batch=10, seed=3)
+        np.testing.assert_array_equal(serial.run(), parallel.run())
+
+    def test_profile(self):
+        ob = par.OpenBall(np.zeros(2), 1)
+        sim = par.ExitTimeSimulator(ob, 10, 0.1, 0.5, 30, batch=10,
+            profile=True)
+        sim.run()
+        phases = dict(par.timing.rows())
+        for name in ("run", "worker", "rng", "indicator", "joblib overhead"):
+            self.assertIn(name, phases)
+
+
+if __name__ == "__main__":
+    unittest.main()
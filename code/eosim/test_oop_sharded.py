@@ -0,0 +1,120 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+import numpy as np
+
+from . import oop_sharded as sh
+
+
+class TestQueue(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = self.dir.name
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_reissue(self):
+        ob = sh.OpenBall(np.zeros(2), 1)
+        sim = sh.oop.ExitTimeSimulator(ob, 10, 0.1, 0.5, 20, seed=0)
+        grid = ob.generate_grid(sim.dx)
+        tasks = [(3, 0, 10), (4, 0, 10)]
+        name, = sh.publish(self.path, "run", sim, grid, [tasks])
+        # a worker claims the shard and dies without a heartbeat
+        owned = sh.claim(self.path)
+        self.assertEqual(sh.shard(owned), name)
+        self.assertIsNone(sh.claim(self.path))
+        claimed = os.path.join(self.path, "claimed", owned)
+        os.utime(claimed, (time.time()-10, time.time()-10))
+        self.assertEqual(sh.reissue(self.path, lease=5), 1)
+        self.assertIsNone(sh.take(self.path, name))
+        sh.work(self.path, idle=0)
+        results, _, error = sh.take(self.path, name)
+        self.assertIsNone(error)
+        expected = sim.run_tasks(grid, tasks)
+        self.assertEqual([r.mean for r, _ in results],
+            [r.mean for r, _ in expected])
+        self.assertEqual(os.listdir(os.path.join(self.path, "done")), [])
+
+    def test_stale_claim(self):
+        ob = sh.OpenBall(np.zeros(2), 1)
+        sim = sh.oop.ExitTimeSimulator(ob, 10, 0.1, 0.5, 20, seed=0)
+        grid = ob.generate_grid(sim.dx)
+        name, = sh.publish(self.path, "run", sim, grid, [[(3, 0, 10)]])
+        slow = sh.claim(self.path)
+        claims = []
+        # the slow worker's claim lapses while it runs and another worker
+        # claims the shard again
+        def lapse(*args):
+            claimed = os.path.join(self.path, "claimed", slow)
+            os.utime(claimed, (time.time()-10, time.time()-10))
+            self.assertEqual(sh.reissue(self.path, lease=5), 1)
+            claims.append(sh.claim(self.path))
+            return run_chunk(*args)
+        run_chunk, sh.run_chunk = sh.run_chunk, lapse
+        try:
+            sh.run_shard(self.path, slow)
+        finally:
+            sh.run_chunk = run_chunk
+        fast, = claims
+        self.assertNotEqual(fast, slow)
+        # it neither reports the shard nor removes the new claim
+        self.assertEqual(os.listdir(os.path.join(self.path, "done")), [])
+        self.assertEqual(os.listdir(os.path.join(self.path, "claimed")),
+            [fast])
+        sh.run_shard(self.path, fast)
+        self.assertIsNotNone(sh.take(self.path, name))
+        for folder in ("pending", "claimed", "done"):
+            self.assertEqual(os.listdir(os.path.join(self.path, folder)), [])
+
+    # a worker that claims the first shard and reports an error for it
+    def fail_first(self):
+        owned = None
+        while owned is None:
+            time.sleep(sh.poll)
+            owned = sh.claim(self.path)
+        sh.write(self.path, "done", sh.shard(owned),
+            (None, {}, ValueError("shard failed")))
+
+    def test_discard_on_error(self):
+        ob = sh.OpenBall(np.zeros(2), 1)
+        saved = sh.queue, sh.local_workers, sh.n_shards
+        sh.queue, sh.local_workers, sh.n_shards = self.path, 0, 2
+        worker = threading.Thread(target=self.fail_first)
+        worker.start()
+        try:
+            sim = sh.ExitTimeSimulator(ob, 10, 0.1, 0.5, 20, seed=0)
+            grid = ob.generate_grid(sim.dx)
+            # the second shard is still pending when the first fails
+            with self.assertRaises(ValueError):
+                sim.run_tasks(grid, [(0, 0, 10), (1, 0, 10)])
+        finally:
+            worker.join()
+            sh.queue, sh.local_workers, sh.n_shards = saved
+        for folder in ("pending", "claimed", "done"):
+            self.assertEqual(os.listdir(os.path.join(self.path, folder)), [])
+
+
+class TestExitTimeSimulator(unittest.TestCase):
+    def test_local_workers(self):
+        ob = sh.OpenBall(np.zeros(2), 1)
+        args = (ob, 10, 0.1, 0.5, 30)
+        saved = sh.queue, sh.local_workers
+        with tempfile.TemporaryDirectory() as path:
+            sh.queue, sh.local_workers = path, 2
+            try:
+                sharded = sh.ExitTimeSimulator(*args, batch=10, seed=3)
+                result = sharded.run()
+                self.assertEqual(len(sh.processes), 2)
+            finally:
+                sh.stop()
+                sh.queue, sh.local_workers = saved
+        serial = sh.oop.ExitTimeSimulator(*args, batch=10, seed=3)
+        self.assertEqual(result, serial.run())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+
+import numpy as np
+
+from . import oop_threaded as th
+
+
+class TestExitTimeSimulator(unittest.TestCase):
+    ob = th.OpenBall(np.zeros(2), 1)
+
+    def test_seed(self):
+        args = (self.ob, 10, 0.1, 0.5, 30)
+        serial = th.oop.ExitTimeSimulator(*args, batch=10, seed=3)
+        threaded = th.ExitTimeSimulator(*args, batch=10, seed=3)
+        self.assertEqual(serial.run(), threaded.run())
+
+    def test_workspace(self):
+        sim = th.ExitTimeSimulator(self.ob, 10, 0.1, 0.5, 30)
+        self.assertIs(sim.workspace(), sim.workspace())
+        other = th.executor().submit(sim.workspace).result()
+        self.assertIsNot(other, sim.workspace())
+
+    def test_memory(self):
+        rss = th.oop.memory.psutil.Process().memory_info().rss / 2**20
+        saved = th.n_threads
+        th.n_threads = 64
+        try:
+            sim = th.ExitTimeSimulator(self.ob, 10, 0.1, 0.5, 30, batch=100,
+                memory=rss+64)
+        finally:
+            th.n_threads = saved
+        self.assertEqual(sim.batch, 100)
+
+    def test_profile(self):
+        sim = th.ExitTimeSimulator(self.ob, 10, 0.1, 0.5, 30, batch=10,
+            profile=True)
+        sim.run()
+        phases = dict(th.oop.timing.rows())
+        for name in ("run", "rng", "indicator", "statistics"):
+            self.assertIn(name, phases)
+
+
+class TestOccupationTimeSimulator(unittest.TestCase):
+    def test_seed(self):
+        ob = th.OpenBall(np.zeros(2), 1)
+        inner = th.OpenBall(np.zeros(2), 0.5)
+        args = (ob, inner, 10, 0.1, 0.25, 30)
+        serial = th.oop.OccupationTimeSimulator(*args, batch=10, seed=3)
+        threaded = th.OccupationTimeSimulator(*args, batch=10, seed=3)
+        self.assertEqual(serial.run(), threaded.run())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -20,6 +20,21 @@ class TestDomainFunctions(unittest.TestCase):
     def test_indicator_func(self):
         ...
 
+    def test_bridge(self):
+        samples, _ = pro.generate_samples(np.ones(2), 5, 0.1, 500)
+        indicator = pro.indicator_func(self.ob2d)
+        distance = pro.distance_func(self.ob2d)
+        np.testing.assert_allclose(distance(np.ones((1, 2))), [1.])
+        plain = pro.get_exit_idx(samples, indicator)
+        bridged = pro.get_exit_idx(samples, indicator, distance, 0.1)
+        self.assertTrue(np.all(bridged <= plain))
+        self.assertLess(np.mean(bridged), np.mean(plain))
+
+    def test_max_t_null(self):
+        with self.assertRaises(ValueError):
+            pro.main("exit-time", domain=self.ob1d, max_t=None, dt=0.1,
+                dx=0.5, n=10)
+
 
 if __name__ == "__main__":
     unittest.main()
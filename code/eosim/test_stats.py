@@ -0,0 +1,27 @@
+import unittest
+
+import numpy as np
+
+from .stats import RunningStats
+
+
+class TestRunningStats(unittest.TestCase):
+    values = np.random.default_rng(0).normal(size=101)
+
+    def test_merge(self):
+        st = RunningStats()
+        for part in np.array_split(self.values, 7):
+            st.update(part)
+        self.assertEqual(st.count, 101)
+        self.assertAlmostEqual(st.mean, np.mean(self.values))
+        self.assertAlmostEqual(st.var, np.var(self.values, ddof=1))
+
+    def test_half_width(self):
+        self.assertEqual(RunningStats().half_width(), np.inf)
+        st = RunningStats.of(self.values)
+        self.assertAlmostEqual(st.half_width(0.95),
+            1.959964 * np.std(self.values, ddof=1) / np.sqrt(101), places=5)
+
+
+if __name__ == "__main__":
+    unittest.main()
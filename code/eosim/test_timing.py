@@ -0,0 +1,39 @@
+import unittest
+
+import numpy as np
+
+from . import oop, timing
+
+
+class TestTiming(unittest.TestCase):
+    def test_phase(self):
+        with timing.collect(False) as counters:
+            with timing.phase("off"):
+                pass
+        self.assertEqual(counters, {})
+        with timing.collect(True) as counters:
+            for _ in range(3):
+                with timing.phase("on"):
+                    pass
+        self.assertEqual(counters["on"][1], 3)
+        self.assertNotIn("on", timing.counters)
+
+    def test_merge(self):
+        with timing.collect(True) as counters:
+            timing.merge({"a": (1., 2)})
+            timing.merge({"a": (0.5, 1), "b": (3., 1)})
+            rows = timing.rows()
+        self.assertEqual(counters, {"a": (1.5, 3), "b": (3., 1)})
+        self.assertEqual([row[0] for row in rows], ["b", "a"])
+
+    def test_profiled_raises(self):
+        ob = oop.OpenBall(np.zeros(1), 1)
+        sim = oop.ExitTimeSimulator(ob, 10, 0.1, 1., 10, profile=True)
+        with self.assertRaises(RuntimeError):
+            with sim.profiled():
+                raise RuntimeError
+        self.assertFalse(timing.enabled)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+
+import numpy as np
+
+from . import oop
+from . import wos
+
+
+class TestExitTimeDistribution(unittest.TestCase):
+    def test_bessel_zeros(self):
+        np.testing.assert_allclose(wos.bessel_zeros(0.5, 3),
+            np.pi * np.arange(1, 4))
+        np.testing.assert_allclose(wos.bessel_zeros(-0.5, 3),
+            np.pi * (np.arange(1, 4)-0.5))
+
+    def test_mean(self):
+        rng = np.random.default_rng(0)
+        for dim in (1, 2, 3):
+            taus = wos.sample_exit_times(np.full(100000, 2.), dim, rng)
+            self.assertAlmostEqual(np.mean(taus), 4/dim, delta=0.03)
+
+
+class TestWalk(unittest.TestCase):
+    ob3d = oop.OpenBall(np.zeros(3), 1)
+
+    def test_exit_time(self):
+        rng = np.random.default_rng(0)
+        b0 = np.array([0.5, 0., 0.])
+        times, _ = wos.walk(b0, 20000, self.ob3d, None, 1e-3, rng)
+        self.assertAlmostEqual(np.mean(times),
+            self.ob3d.expected_exit_time(b0), delta=0.01)
+
+    def test_occupation_time(self):
+        rng = np.random.default_rng(0)
+        oa = oop.OpenAnnulus(np.zeros(3), 0.5, 1)
+        times, counts = wos.walk(np.zeros(3), 100, self.ob3d, self.ob3d,
+            1e-3, rng)
+        np.testing.assert_allclose(times, counts)
+        times, counts = wos.walk(np.zeros(3), 100, self.ob3d, oa, 1e-3, rng)
+        self.assertTrue(np.all(counts < times))
+
+    def test_simulator(self):
+        sim = oop.ExitTimeSimulator(self.ob3d, None, None, 1, 5000,
+            engine="wos", seed=0)
+        self.assertAlmostEqual(sim.run(), 1/3, delta=0.02)
+        with self.assertRaises(ValueError):
+            oop.ExitTimeSimulator(self.ob3d, None, None, 1, 10,
+                engine="wos", antithetic=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+# seconds and calls per phase, counted only while enabled; worker processes
+# send theirs back to be merged into the parent's, and worker threads add to
+# them under the lock
+enabled = False
+counters = {}
+lock = threading.Lock()
+
+
+@contextmanager
+def phase(name):
+    if not enabled:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        with lock:
+            seconds, calls = counters.get(name, (0., 0))
+            counters[name] = (seconds + time.perf_counter() - t0, calls + 1)
+
+
+def reset():
+    counters.clear()
+
+
+# fresh counters for the duration of the block, e.g. for the chunk a worker
+# runs, which may share the parent's process
+@contextmanager
+def collect(enable):
+    global counters, enabled
+    saved = counters, enabled
+    counters, enabled = {}, enable
+    try:
+        yield counters
+    finally:
+        counters, enabled = saved
+
+
+def merge(other):
+    for name, (seconds, calls) in other.items():
+        total, count = counters.get(name, (0., 0))
+        counters[name] = (total + seconds, count + calls)
+
+
+# report rows, slowest phase first, with each phase's share of the run
+def rows():
+    run = counters.get("run", (0., 0))[0]
+    rows = []
+    for name, (seconds, calls) in sorted(counters.items(),
+            key=lambda item: -item[1][0]):
+        share = f" ({seconds/run:.0%})" if run else ""
+        rows.append([name, f"{seconds:.3g} s{share} in {calls} calls"])
+    return rows
@@ -0,0 +1,81 @@
+from functools import lru_cache
+
+import numpy as np
+from scipy.optimize import brentq
+from scipy.special import betainc, gamma, jv
+
+
+# first positive zeros of the Bessel function J_nu
+def bessel_zeros(nu, k):
+    xs = np.linspace(1e-6, (k+np.abs(nu)+2)*np.pi, 64*(k+2))
+    ys = jv(nu, xs)
+    idx = np.nonzero(np.sign(ys[:-1]) != np.sign(ys[1:]))[0][:k]
+    return np.array([brentq(lambda x: jv(nu, x), xs[i], xs[i+1])
+        for i in idx])
+
+
+# CDF of the exit time of the unit ball in dim dimensions started at its
+# centre, tabulated from the series
+#   P(T > t) = sum_k j_k^(nu-1) / (2^(nu-1) Gamma(nu+1) J_(nu+1)(j_k))
+#              * exp(-j_k^2 t / 2),   nu = dim/2 - 1,
+# where j_k are the positive zeros of J_nu; the truncated series is only
+# used where its first omitted term is negligible, and T is taken to be
+# at least that small t_min
+@lru_cache(maxsize=None)
+def exit_time_cdf(dim, terms=100, size=4096):
+    nu = dim/2 - 1
+    js = bessel_zeros(nu, terms)
+    cs = js**(nu-1) / (2**(nu-1) * gamma(nu+1) * jv(nu+1, js))
+    t_min = 2 * np.log(np.abs(cs[-1])/1e-12) / js[-1]**2
+    t_max = 2 * np.log(np.abs(cs[0])/1e-12) / js[0]**2
+    ts = np.linspace(t_min, t_max, size)
+    survival = np.exp(-np.outer(ts, js**2)/2) @ cs
+    cdf = np.maximum.accumulate(np.clip(1-survival, 0., 1.))
+    cdf[0], cdf[-1] = 0., 1.
+    cdf, idx = np.unique(cdf, return_index=True)
+    return cdf, ts[idx]
+
+
+# exit times of a ball of radius rho started at its centre
+def sample_exit_times(rho, dim, rng):
+    cdf, ts = exit_time_cdf(dim)
+    return rho**2 * np.interp(rng.random(np.size(rho)), cdf, ts)
+
+
+# fraction of a ball of radius rho lying on the side of a hyperplane at
+# signed distance s from its centre that contains the centre when s > 0
+def cap_fraction(s, rho, dim):
+    t = np.clip(s/rho, -1., 1.)
+    return betainc((dim+1)/2, (dim+1)/2, (1+t)/2)
+
+
+# walk on spheres: every path jumps to a uniform point on the largest
+# sphere around it that stays inside domain, collecting that sphere's exit
+# time, until it is within eps of the boundary of domain. Returns exit
+# times from domain and occupation times of domain_v before that. Spheres
+# also stop at the boundary of domain_v, except within sqrt(eps) of it,
+# where they straddle it and count the fraction of the ball inside V.
+def walk(b0, m, domain, domain_v, eps, rng):
+    dim = np.size(b0)
+    pos = np.tile(np.asarray(b0, dtype=float), (m, 1))
+    if not np.all(domain.indicator(pos)):
+        raise RuntimeError("exit time is out of reach")
+    times = np.zeros(m)
+    counts = np.zeros(m)
+    active = np.arange(m)
+    while active.size:
+        pts = pos[active]
+        rho = domain.distance(pts)
+        running = rho >= eps
+        active, pts, rho = active[running], pts[running], rho[running]
+        if domain_v is not None:
+            rho_v = domain_v.distance(pts)
+            rho = np.minimum(rho, np.maximum(np.abs(rho_v), np.sqrt(eps)))
+        taus = sample_exit_times(rho, dim, rng)
+        if domain_v is not None:
+            counts[active] += taus * cap_fraction(rho_v, rho, dim)
+        times[active] += taus
+        directions = rng.normal(size=(active.size, dim))
+        directions /= np.linalg.norm(directions, axis=-1, keepdims=True)
+        pos[active] = pts + rho[:, np.newaxis]*directions
+    return times, counts
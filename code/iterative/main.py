@@ -4,24 +4,74 @@ import numpy as np
 import psutil
 from joblib import Parallel, delayed
 from scipy.interpolate import NearestNDInterpolator
+from scipy.sparse import csr_matrix
+from scipy.spatial import cKDTree
 
 
 rng = np.random.default_rng()
 n_cores = psutil.cpu_count(logical=False)
 
 
-class BrownianMotion():
-    def __init__(self, b0, max_t, dt):
-        num = np.int_(np.rint(max_t/dt))
-        increments = rng.normal(0., np.sqrt(dt), size=(num-1, np.size(b0)))
-        self.bts = np.cumsum(np.insert(increments, 0, b0, axis=0), axis=0)
+# one path per start point in b0s, advanced chunk steps at a time; walk
+# yields the ids of the active paths, their next chunk of points and which
+# of those points come before the path's exit
+class BrownianPaths():
+    def __init__(self, b0s, max_t, dt, chunk=32, rng=rng):
+        self.b0s = np.asarray(b0s, dtype=float)
+        self.num = np.int_(np.rint(max_t/dt))
+        self.dt = dt
+        self.chunk = chunk
+        self.rng = rng
 
-    def get_exit_idx(self, indicator):
-        bool_arr = indicator(self.bts)
-        idx = np.argmin(bool_arr)
-        if idx == 0:
+    def walk(self, indicator):
+        n, dim = self.b0s.shape
+        if not np.all(indicator(self.b0s)):
             raise RuntimeError("exit index is out of reach")
-        return idx
+        pos = self.b0s.copy()
+        active = np.arange(n)
+        step = 0
+        while active.size:
+            k = min(self.chunk, self.num-1-step)
+            if k <= 0:
+                raise RuntimeError("exit index is out of reach")
+            pts = self.rng.normal(0., np.sqrt(self.dt),
+                size=(active.size, k, dim))
+            np.cumsum(pts, axis=1, out=pts)
+            pts += pos[:, np.newaxis]
+            inside = indicator(pts)
+            first = np.argmin(inside, axis=1)
+            exited = ~inside[np.arange(active.size), first]
+            stop = np.where(exited, first, k)
+            yield active, pts, np.arange(k) < stop[:, np.newaxis]
+            pos = pts[~exited, -1]
+            active = active[~exited]
+            step += k
+
+
+# nearest grid point of any point by index arithmetic on the regular
+# lattice of the grid; only points whose nearest lattice node is not a grid
+# point (next to the boundary) fall back to a k-d tree built once
+class Lattice():
+    def __init__(self, grid):
+        self.lo = np.min(grid, axis=0)
+        self.h = 1.
+        if len(grid) > 1:
+            self.h = min(np.min(np.diff(np.unique(xs))) for xs in grid.T
+                if np.unique(xs).size > 1)
+        nodes = np.int_(np.rint((grid-self.lo) / self.h))
+        self.shape = np.max(nodes, axis=0) + 1
+        self.table = np.full(self.shape, -1)
+        self.table[tuple(nodes.T)] = np.arange(len(grid))
+        self.tree = cKDTree(grid)
+
+    def lookup(self, pts):
+        idx = np.rint((pts-self.lo) / self.h).astype(np.int_)
+        np.clip(idx, 0, self.shape-1, out=idx)
+        nearest = self.table[tuple(np.moveaxis(idx, -1, 0))]
+        missing = nearest < 0
+        if np.any(missing):
+            _, nearest[missing] = self.tree.query(pts[missing])
+        return nearest
 
 
 class Domain(ABC):
@@ -52,7 +102,7 @@ class OpenBall(Domain):
         return f"{type(self).__name__} ({self.c}, {self.r})"
 
     def indicator(self, pts):
-        c_distances = np.linalg.norm(pts-self.c, axis=1)
+        c_distances = np.linalg.norm(pts-self.c, axis=-1)
         return c_distances < self.r
 
     def generate_grid(self, dx):
@@ -63,7 +113,7 @@ class OpenBall(Domain):
         return grid[idx]
 
     def u0(self, pts):
-        c_distances = np.linalg.norm(pts-self.c, axis=1)
+        c_distances = np.linalg.norm(pts-self.c, axis=-1)
         return self.r - c_distances
 
 
@@ -78,7 +128,7 @@ class OpenAnnulus(Domain):
         return f"{type(self).__name__} ({self.c}, {self.r1}, {self.r2})"
 
     def indicator(self, pts):
-        c_distances = np.linalg.norm(pts-self.c, axis=1)
+        c_distances = np.linalg.norm(pts-self.c, axis=-1)
         return (self.r1<c_distances) & (c_distances<self.r2)
 
     def generate_grid(self, dx):
@@ -89,42 +139,146 @@ class OpenAnnulus(Domain):
         return grid[idx]
 
     def u0(self, pts):
-        c_distances = np.linalg.norm(pts-self.c, axis=1)
+        c_distances = np.linalg.norm(pts-self.c, axis=-1)
         return (c_distances-self.r1) * (self.r2-c_distances)
 
 
+# fixed-point accelerators: given the current iterate ui and its image
+# gi = G(ui), next(ui, gi) returns the iterate to evaluate next
+class Picard():
+    def next(self, ui, gi):
+        return gi
+
+
+# Anderson mixing: extrapolate from the last depth residuals gi-ui by the
+# least-squares combination of their differences
+class Anderson():
+    def __init__(self, depth=5):
+        self.depth = depth
+        self.us = []
+        self.gs = []
+
+    def next(self, ui, gi):
+        self.us = (self.us + [ui])[-self.depth-1:]
+        self.gs = (self.gs + [gi])[-self.depth-1:]
+        if len(self.us) == 1:
+            return gi
+        fs = np.array(self.gs) - np.array(self.us)
+        d_fs = np.diff(fs, axis=0).T
+        d_gs = np.diff(np.array(self.gs), axis=0).T
+        gamma, *_ = np.linalg.lstsq(d_fs, fs[-1], rcond=None)
+        return gi - d_gs @ gamma
+
+
+# vector Aitken (Irons-Tuck) extrapolation after every two plain steps
+class Aitken():
+    def __init__(self):
+        self.last = None
+
+    def next(self, ui, gi):
+        if self.last is None or not np.array_equal(self.last[1], ui):
+            self.last = (ui, gi)
+            return gi
+        x0, x1, x2 = self.last[0], ui, gi
+        self.last = None
+        d1, d2 = x2 - x1, x2 - 2*x1 + x0
+        norm = np.dot(d2, d2)
+        return x2 - np.dot(d1, d2) / norm * d1 if norm > 0 else x2
+
+
+def save_solution(path, grid, u):
+    np.savez(path, grid=grid, u=u)
+
+
+# the interpolant of a saved solution, e.g. to warm-start a run on a finer
+# grid or for a nearby p
+def load_solution(path):
+    data = np.load(path)
+    return NearestNDInterpolator(data["grid"], data["u"])
+
+
 class Simulator():
-    def __init__(self, domain, p, max_t, dt, dx, n):
+    def __init__(self, domain, p, max_t, dt, dx, n, batch=10000, chunk=32,
+            reuse_paths=False, seed=None):
         self.domain = domain
         self.p = p
         self.max_t = max_t
         self.dt = dt
         self.dx = dx
         self.n = n
+        self.batch = batch
+        self.chunk = chunk
+        self.reuse_paths = reuse_paths
+        self.seed = seed
+
+    # all n paths of all grid points, in blocks of batch paths spread over
+    # the cores; block_f(owners, paths) reduces one block, where owners[j]
+    # is the grid point path j starts from. With a seed every sweep draws
+    # the same paths
+    def sweep(self, grid, block_f):
+        owners = np.repeat(np.arange(len(grid)), self.n)
+        blocks = np.array_split(owners,
+            max(1, np.int_(np.ceil(owners.size/self.batch))))
+        seeds = np.random.SeedSequence(self.seed).spawn(len(blocks))
+        def bw_f(block, seed):
+            bps = BrownianPaths(grid[block], self.max_t, self.dt, self.chunk,
+                np.random.default_rng(seed))
+            return block_f(block, bps)
+        return Parallel(n_jobs=n_cores)(delayed(bw_f)(block, seed)
+            for block, seed in zip(blocks, seeds))
+
+    def one_iteration(self, ui, grid, lattice):
+        values = np.power(ui, self.p)
+        def block_f(owners, bps):
+            sums = values[owners].copy()
+            for active, pts, before in bps.walk(self.domain.indicator):
+                sums[active] += np.sum(values[lattice.lookup(pts)] * before,
+                    axis=1)
+            return np.bincount(owners, weights=sums, minlength=len(grid))
+        totals = np.sum(self.sweep(grid, block_f), axis=0)
+        return totals * self.dt / self.n
+
+    # visits[i, j]: steps that the paths from grid point i spend nearest to
+    # grid point j before exiting, so that one iteration on these fixed
+    # (common random number) paths is visits @ ui**p * dt / n
+    def visit_matrix(self, grid, lattice):
+        size = (len(grid), len(grid))
+        def block_f(owners, bps):
+            rows, cols = [owners], [owners]
+            for active, pts, before in bps.walk(self.domain.indicator):
+                cells = lattice.lookup(pts)
+                rows.append(np.broadcast_to(owners[active, np.newaxis],
+                    before.shape)[before])
+                cols.append(cells[before])
+            rows, cols = np.concatenate(rows), np.concatenate(cols)
+            return csr_matrix((np.ones(rows.size), (rows, cols)), shape=size)
+        return sum(self.sweep(grid, block_f), csr_matrix(size))
 
-    def one_iteration(self, ui, grid):
-        def sw_integral(pt):
-            bm = BrownianMotion(pt, self.max_t, self.dt)
-            exit_idx = bm.get_exit_idx(self.domain.indicator)
-            interpolant = NearestNDInterpolator(grid, np.power(ui, self.p))
-            return np.sum(interpolant(bm.bts[:exit_idx])) * self.dt
-        def pw_update(pt):
-            integrals = Parallel(n_jobs=n_cores)(
-                delayed(sw_integral)(pt) for _ in np.arange(self.n))
-            return np.mean(integrals)
-        return np.vectorize(pw_update, signature="(d)->()")(grid)
-
-    def run(self, epsilon):
+    # warm_start: callable giving the initial iterate on the grid instead
+    # of Domain.u0; accelerator: Picard (default), Anderson or Aitken;
+    # save: path to store the solution for later warm starts
+    def run(self, epsilon, warm_start=None, accelerator=None, save=None):
         grid = self.domain.generate_grid(self.dx)
-        ui = self.domain.u0(grid)
+        lattice = Lattice(grid)
+        if self.reuse_paths:
+            visits = self.visit_matrix(grid, lattice)
+            iteration = lambda ui: visits @ np.power(ui, self.p) \
+                * self.dt / self.n
+        else:
+            iteration = lambda ui: self.one_iteration(ui, grid, lattice)
+        accelerator = Picard() if accelerator is None else accelerator
+        ui = self.domain.u0(grid) if warm_start is None else warm_start(grid)
         delta = epsilon + 1
         num = 0
         print("deltas:")
         while delta > epsilon:
-            uj = self.one_iteration(ui, grid)
-            delta = np.linalg.norm(uj-ui, ord=np.inf)
+            gi = iteration(ui)
+            delta = np.linalg.norm(gi-ui, ord=np.inf)
             print(delta)
-            ui = uj
+            ui = gi if delta <= epsilon else \
+                np.maximum(accelerator.next(ui, gi), 0.)
             num += 1
         print(f"{num} iterations")
+        if save is not None:
+            save_solution(save, grid, ui)
         return NearestNDInterpolator(grid, ui)
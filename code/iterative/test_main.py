@@ -0,0 +1,133 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from scipy.interpolate import NearestNDInterpolator
+
+from .main import (Aitken, Anderson, BrownianPaths, Lattice, OpenBall,
+    Picard, Simulator, load_solution)
+
+
+class TestLattice(unittest.TestCase):
+    ob = OpenBall(np.zeros(2), 1.)
+    grid = ob.generate_grid(0.2)
+
+    def test_lookup(self):
+        # points all around the boundary, where the nearest lattice node is
+        # often outside the domain, and beyond it
+        rng = np.random.default_rng(0)
+        angles = rng.uniform(0, 2*np.pi, 500)
+        radii = rng.uniform(0.8, 1.3, 500)
+        pts = radii[:, np.newaxis] * np.c_[np.cos(angles), np.sin(angles)]
+        nearest = NearestNDInterpolator(self.grid, np.arange(len(self.grid)))
+        lattice = Lattice(self.grid)
+        np.testing.assert_array_equal(lattice.lookup(pts), nearest(pts))
+        np.testing.assert_array_equal(lattice.lookup(pts.reshape(50, 10, 2)),
+            nearest(pts).reshape(50, 10))
+
+
+class TestSimulator(unittest.TestCase):
+    ob = OpenBall(np.zeros(2), 1.)
+    sim = Simulator(ob, 2, 5, 0.05, 0.5, 3, seed=1)
+    grid = ob.generate_grid(0.5)
+
+    # the paths of a sweep in one block, each up to the chunk it exits in
+    def paths(self):
+        owners = np.repeat(np.arange(len(self.grid)), self.sim.n)
+        seed, = np.random.SeedSequence(self.sim.seed).spawn(1)
+        bps = BrownianPaths(self.grid[owners], self.sim.max_t, self.sim.dt,
+            self.sim.chunk, np.random.default_rng(seed))
+        paths = [[] for _ in owners]
+        for active, pts, _ in bps.walk(self.ob.indicator):
+            for j, path in zip(active, pts):
+                paths[j].extend(path)
+        return owners, paths
+
+    def test_one_iteration(self):
+        ui = self.ob.u0(self.grid)
+        values = ui ** self.sim.p
+        expected = np.zeros(len(self.grid))
+        for i, path in zip(*self.paths()):
+            expected[i] += values[i]
+            for pt in path:
+                if np.linalg.norm(pt) >= 1:
+                    break
+                j = np.argmin(np.linalg.norm(self.grid-pt, axis=1))
+                expected[i] += values[j]
+        expected *= self.sim.dt / self.sim.n
+        result = self.sim.one_iteration(ui, self.grid, Lattice(self.grid))
+        np.testing.assert_allclose(result, expected)
+
+    def test_visit_matrix(self):
+        lattice = Lattice(self.grid)
+        ui = self.ob.u0(self.grid)
+        visits = self.sim.visit_matrix(self.grid, lattice)
+        np.testing.assert_allclose(
+            visits @ ui**self.sim.p * self.sim.dt / self.sim.n,
+            self.sim.one_iteration(ui, self.grid, lattice))
+
+
+class TestAccelerators(unittest.TestCase):
+    # a linear contraction u -> a @ u + 1 with rates 0.9, 0.6 and 0.3
+    rng = np.random.default_rng(0)
+    q, _ = np.linalg.qr(rng.normal(size=(3, 3)))
+    a = q @ np.diag([0.9, 0.6, 0.3]) @ q.T
+
+    def steps(self, accelerator, epsilon=1e-8):
+        ui = np.zeros(3)
+        for num in range(1, 1000):
+            gi = self.a @ ui + 1
+            if np.linalg.norm(gi-ui, ord=np.inf) <= epsilon:
+                return num
+            ui = accelerator.next(ui, gi)
+
+    def test_fewer_steps(self):
+        picard = self.steps(Picard())
+        self.assertLess(self.steps(Anderson()), picard)
+        self.assertLess(self.steps(Aitken()), picard)
+
+
+class TestWarmStart(unittest.TestCase):
+    ob = OpenBall(np.zeros(2), 1.)
+
+    # the solution and the number of iterations it took
+    def solve(self, sim, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            u = sim.run(1e-3, **kwargs)
+        return u, int(out.getvalue().split()[-2])
+
+    # p < 1, where the iteration converges to a positive solution rather
+    # than to 0
+    def test_round_trip(self):
+        sim = Simulator(self.ob, 0.5, 5, 0.05, 0.5, 200, reuse_paths=True,
+            seed=2)
+        grid = self.ob.generate_grid(sim.dx)
+        with tempfile.TemporaryDirectory() as path:
+            path = os.path.join(path, "solution.npz")
+            u, _ = self.solve(sim, save=path)
+            saved = load_solution(path)
+        np.testing.assert_array_equal(saved(grid), u(grid))
+        self.assertTrue(np.all(u(grid) > 0.1))
+
+    # the solution on a coarse grid is a better start on a finer one than
+    # Domain.u0
+    def test_coarse_grid(self):
+        coarse = Simulator(self.ob, 0.5, 5, 0.05, 0.5, 200,
+            reuse_paths=True, seed=2)
+        fine = Simulator(self.ob, 0.5, 5, 0.05, 0.25, 200, reuse_paths=True,
+            seed=2)
+        grid = self.ob.generate_grid(fine.dx)
+        with tempfile.TemporaryDirectory() as path:
+            path = os.path.join(path, "solution.npz")
+            self.solve(coarse, save=path)
+            warm, num = self.solve(fine, warm_start=load_solution(path))
+        cold, cold_num = self.solve(fine)
+        self.assertLess(num, cold_num)
+        np.testing.assert_allclose(warm(grid), cold(grid), atol=1e-2)
+
+
+if __name__ == "__main__":
+    unittest.main()